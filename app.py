@@ -1,9 +1,22 @@
-from flask import Flask, request, jsonify, render_template_string
-from openai import OpenAI
+from quart import Quart, Response, request, render_template
+from quart.json.provider import JSONProvider
+from openai import AsyncOpenAI, DefaultAioHttpClient, NotFoundError
+import httpx
 import os
-from dotenv import load_dotenv
-import json
-import time  # For simulating delay during testing
+import re
+import orjson
+import msgspec
+import numpy as np
+import hashlib
+import hmac
+import functools
+import gzip
+import asyncio
+import time
+import types
+from collections import Counter
+from cachetools import Cache, LFUCache
+from markupsafe import escape
 
 """
 dePrompt - AI Prompt Engineering Assistant
@@ -15,29 +28,297 @@ structure, precision, model-specific optimizations, and guardrails.
 Copyright (c) 2025 Purav Bhardwaj
 """
 
-# Load environment variables
-load_dotenv()
+# Create Quart (async Flask) application
+app = Quart(__name__)
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify() and request.get_json()."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+app.json = OrjsonProvider(app)
+
+# Constant JSON bodies, serialized once at import
+UNKNOWN_MODEL_JSON = orjson.dumps({"error": "Unknown target model"})
+NOT_AN_OBJECT_JSON = orjson.dumps({"error": "Expected a JSON object"})
+BAD_BATCH_JSON = orjson.dumps({"error": "Expected {\"prompts\": [...]} with 1 to 1000 objects that each have a prompt and string fields"})
+UNKNOWN_BATCH_JSON = orjson.dumps({"error": "Unknown batch"})
+UNAUTHORIZED_JSON = orjson.dumps({"error": "Unauthorized"})
+NOT_FOUND_JSON = orjson.dumps({"error": "Not found"})
+BAD_ORIGINAL_PROMPT_JSON = orjson.dumps({"error": "Expected original_prompt to be a string"})
+BAD_CONVERSATION_JSON = orjson.dumps({"error": "Expected conversation to be a list of messages with text content"})
+CONVERSATION_TOO_LARGE_JSON = orjson.dumps({"error": "The conversation is too long"})
+PROMPT_TOO_LARGE_JSON = orjson.dumps({"error": "The prompt or context is too long"})
+
+# Longest prompt accepted (about 2000 tokens). Longer input is rejected
+# before any model call, since it would be billed on every call of the
+# pipeline and, for questions, on every turn. The context can hold a whole
+# question conversation, so it gets the conversation's limit.
+MAX_PROMPT_CHARS = 8192
+MAX_CONTEXT_CHARS = 50_000
+
+def json_bytes(body, status=200):
+    """Response for a pre-serialized JSON body."""
+    return Response(body, status=status, mimetype="application/json")
+
+@functools.cache
+def _config():
+    """Load .env and validate settings once per process.
+
+    With gunicorn's preload_app this runs in the master before forking, so
+    workers inherit the parsed environment instead of re-reading .env.
+    Deployments that set the environment directly have no .env file, so
+    python-dotenv is only imported when there is one to read.
+    """
+    env_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+    if os.path.exists(env_file):
+        from dotenv import load_dotenv
+        load_dotenv(env_file)
+    api_key = os.getenv('API_KEY')
+    if not api_key:
+        raise ValueError("API_KEY environment variable is not set")
+    return types.SimpleNamespace(api_key=api_key)
+
+# Initialize the async OpenAI client with a single shared connection pool so
+# one worker can multiplex many in-flight LLM calls. The aiohttp transport
+# avoids httpx's throughput collapse under high concurrency. Idle TLS
+# connections are kept warm for two minutes so bursty traffic skips the
+# handshake, and a dead endpoint fails fast on connect. Rate limits, timeouts
+# and 5xx responses are retried by the SDK with jittered exponential backoff
+# (0.5s doubling to an 8s cap); retries are logged by the "openai" logger.
+#
+# Every in-flight call, streams included, holds a connection, so the pool size
+# also caps how many OpenAI calls one worker makes at once; further calls wait
+# up to the pool timeout for a free connection. OPENAI_CONCURRENCY keeps bursts
+# inside the account's rate limits.
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "20"))
+client = AsyncOpenAI(
+    api_key=_config().api_key,
+    max_retries=3,
+    http_client=DefaultAioHttpClient(
+        limits=httpx.Limits(max_connections=OPENAI_CONCURRENCY, max_keepalive_connections=OPENAI_CONCURRENCY,
+                            keepalive_expiry=120),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+)
 
-# Create Flask application
-app = Flask(__name__)
+# Log at WARNING unless LOG_LEVEL asks for more; debug messages format lazily
+# so their arguments cost nothing when disabled
+app.logger.setLevel(os.getenv("LOG_LEVEL", "WARNING").upper())
 
-# Get API key and verify it exists
-api_key = os.getenv('API_KEY')
-if not api_key:
-    raise ValueError("API_KEY environment variable is not set")
+# Close the pooled connections when the server shuts down
+@app.after_serving
+async def close_client():
+    await client.close()
 
-# Initialize the custom OpenAI client
-client = OpenAI(
-    api_key=api_key
-)
+class ExpiringLFUCache(LFUCache):
+    """LFU cache whose entries also expire ttl seconds after being stored.
+
+    Popular prompts repeat often, so evicting the least frequently used entry
+    keeps more hits than LRU; the TTL stops model upgrades from serving stale
+    output forever. Expired entries are dropped by get() and, once the cache
+    is full, before anything else is evicted.
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.timer = timer
+
+    def _expired(self, key, now):
+        expires, _ = Cache.__getitem__(self, key)
+        return expires < now
+
+    def __contains__(self, key):
+        return super().__contains__(key) and not self._expired(key, self.timer())
+
+    def __getitem__(self, key):
+        _, value = super().__getitem__(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if not super().__contains__(key) and self.currsize >= self.maxsize:
+            self.expire()
+        super().__setitem__(key, (self.timer() + self.ttl, value))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        if super().__contains__(key):
+            del self[key]
+        return default
+
+    def pop(self, key, *default):
+        # LFUCache.popitem evicts through pop, and its victim may have expired
+        if super().__contains__(key):
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *default)
+
+    def expire(self):
+        """Drop every expired entry."""
+        now = self.timer()
+        for key in [key for key in self if self._expired(key, now)]:
+            del self[key]
+
+# Finished improvements, keyed by a hash of the request inputs
+improvement_cache = ExpiringLFUCache(maxsize=2048, ttl=24 * 60 * 60)
+
+# Runs currently in flight, keyed by (cache name, request key)
+in_flight = {}
+
+# Process-local counters, exposed on /metrics in Prometheus text format
+metrics = Counter()
+
+def count(name, amount=1, **labels):
+    metrics[(name, tuple(sorted(labels.items())))] += amount
+
+def record_usage(call, usage):
+    """Count a completion's prompt tokens, split by whether OpenAI's prompt
+    cache served them."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (details.cached_tokens or 0) if details is not None else 0
+    count("deprompt_prompt_tokens_total", cached, call=call, kind="cached")
+    count("deprompt_prompt_tokens_total", usage.prompt_tokens - cached, call=call, kind="uncached")
+    app.logger.debug("%s: %d prompt tokens, %d cached", call, usage.prompt_tokens, cached)
+
+def normalize_text(text):
+    """Canonical form of user input: LF line endings, no trailing or outer whitespace."""
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+def request_key(*parts):
+    """Stable cache key for a set of request inputs.
+
+    The parts are JSON-encoded, so a separator inside one part cannot make
+    two different inputs collide.
+    """
+    return hashlib.blake2b(orjson.dumps(parts), digest_size=16).hexdigest()
+
+async def coalesce(name, key, cache, factory):
+    """Return the cached result for key, or join/start the single in-flight run.
+
+    The run executes as its own task, so a caller disconnecting does not
+    cancel the work other callers are waiting on.
+    """
+    if key in cache:
+        count("deprompt_cache_requests_total", cache=name, result="hit")
+        return cache[key]
+    task = in_flight.get((name, key))
+    if task is None:
+        count("deprompt_cache_requests_total", cache=name, result="miss")
+        task = asyncio.ensure_future(factory())
+        in_flight[(name, key)] = task
+
+        def finish(t):
+            in_flight.pop((name, key), None)
+            if not t.cancelled() and t.exception() is None:
+                cache[key] = t.result()
+
+        task.add_done_callback(finish)
+    else:
+        count("deprompt_cache_requests_total", cache=name, result="coalesced")
+    return await asyncio.shield(task)
+
+class SemanticCache:
+    """Cache looked up by embedding similarity instead of an exact key.
+
+    Vectors are L2-normalised, so one matrix-vector product scores the query
+    against every entry by cosine similarity. Entries only match within their
+    namespace, and once maxsize is reached the least recently used entry is
+    replaced.
+    """
+
+    def __init__(self, maxsize, threshold):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.vectors = None  # allocated on first add, once the dimension is known
+        self.namespaces = np.zeros(maxsize, dtype=np.int64)
+        self.last_used = np.zeros(maxsize)
+        self.values = [None] * maxsize
+        self.size = 0
+
+    @staticmethod
+    def namespace_id(namespace):
+        return int.from_bytes(hashlib.blake2b(namespace.encode(), digest_size=8).digest(), "little", signed=True)
+
+    def lookup(self, vector, namespace=""):
+        if not self.size:
+            return None
+        scores = self.vectors[:self.size] @ vector
+        scores[self.namespaces[:self.size] != self.namespace_id(namespace)] = -1.0
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            return None
+        self.last_used[best] = time.monotonic()
+        return self.values[best]
+
+    def add(self, vector, value, namespace=""):
+        if self.vectors is None:
+            self.vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+        if self.size < self.maxsize:
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(self.last_used.argmin())
+        self.vectors[slot] = vector
+        self.namespaces[slot] = self.namespace_id(namespace)
+        self.last_used[slot] = time.monotonic()
+        self.values[slot] = value
+
+# Semantic caching trades an embedding call per miss for skipping LLM calls on
+# near-duplicate inputs; opt-in because a wrong match returns another user's
+# (similar) result
+SEMANTIC_CACHING = os.getenv("SEMANTIC_CACHING", "").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.97))
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Embeddings by text, so the semantic tiers of nested cached steps (a
+# submission's results page and its analysis) share one embedding call
+embedding_cache = ExpiringLFUCache(maxsize=1024, ttl=60 * 60)
+
+async def embed(text):
+    """Return the L2-normalised embedding of text."""
+    response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+async def semantic_cached(name, cache, text, namespace, factory):
+    """Return factory()'s result, or the stored result for a near-duplicate text."""
+    try:
+        vector = await coalesce("embedding", request_key(EMBEDDING_MODEL, text), embedding_cache,
+                                lambda: embed(text))
+    except Exception as e:
+        app.logger.warning("Embedding failed, bypassing the %s cache: %s", name, e)
+        return await factory()
+    value = cache.lookup(vector, namespace)
+    if value is not None:
+        count("deprompt_cache_requests_total", cache=name, result="hit")
+        return value
+    count("deprompt_cache_requests_total", cache=name, result="miss")
+    value = await factory()
+    cache.add(vector, value, namespace)
+    return value
 
 # Model-specific guidance
 model_guidance = {
     # Model guidance dictionary 
-    # capabilities, optimal uses, context windows, reliability scores,
+    # display name, provider, capabilities, optimal uses, context windows, reliability scores,
     # and special considerations for each model
     
     "gpt-4o": {
+        "name": "GPT-4o",
+        "provider": "OpenAI",
         "capabilities": ["Multimodal", "advanced reasoning", "200+ languages", "real-time knowledge"],
         "optimal_uses": ["Complex tasks", "image understanding", "multilingual content", "code generation"],
         "context_window": 128000,
@@ -49,6 +330,8 @@ model_guidance = {
 - More cost-effective than o1 models for general tasks"""
     },
     "gpt-4o-mini": {
+        "name": "GPT-4o Mini",
+        "provider": "OpenAI",
         "capabilities": ["Multimodal", "speed", "cost-effectiveness", "multilingual"],
         "optimal_uses": ["Routine tasks", "image understanding", "high-volume applications"],
         "context_window": 128000,
@@ -60,6 +343,8 @@ model_guidance = {
 - Best for applications requiring frequent API calls"""
     },
     "gpt-4.5": {
+        "name": "GPT-4.5",
+        "provider": "OpenAI",
         "capabilities": ["Advanced reasoning", "creative generation", "factual grounding"],
         "optimal_uses": ["Creative writing", "advanced problem-solving", "strategic analysis"],
         "context_window": 128000,
@@ -71,6 +356,8 @@ model_guidance = {
 - Improved factual accuracy with reduced hallucinations"""
     },
     "o3-mini": {
+        "name": "o3-mini",
+        "provider": "OpenAI",
         "capabilities": ["Specialized reasoning", "step-by-step problem-solving", "text-only processing"],
         "optimal_uses": ["Mathematics", "coding challenges", "logical reasoning tasks"],
         "context_window": 200000,
@@ -82,6 +369,8 @@ model_guidance = {
 - More factually accurate than general-purpose models"""
     },
     "o1": {
+        "name": "o1",
+        "provider": "OpenAI",
         "capabilities": ["Expert reasoning", "multimodal understanding", "precise problem-solving"],
         "optimal_uses": ["Complex technical work", "mathematical proofs", "detailed analysis"],
         "context_window": 200000,
@@ -91,19 +380,10 @@ model_guidance = {
 - Often benefits from being asked to solve step by step
 - Provides detailed explanations of its reasoning process
 - Consider the cost tradeoff for simpler tasks"""
-    },
-    "claude-3.5-sonnet": {
-        "capabilities": ["Balanced performance", "long context", "coding excellence", "tool use"],
-        "optimal_uses": ["Software development", "research synthesis", "document analysis"],
-        "context_window": 200000,
-        "reliability": 0.97,
-        "considerations": """
-- Strong technical accuracy while maintaining approachable tone
-- Excellent at understanding and working within guidelines
-- Native computer/tool use capabilities for complex tasks
-- Maintains context awareness across very lengthy exchanges"""
     },
     "claude-3.7-sonnet": {
+        "name": "Claude 3.7 Sonnet",
+        "provider": "Anthropic",
         "capabilities": ["Advanced reasoning", "nuanced understanding", "extended thinking mode"],
         "optimal_uses": ["Complex reasoning tasks", "sensitive content moderation", "thorough analysis"],
         "context_window": 200000,
@@ -113,8 +393,23 @@ model_guidance = {
 - Includes an "extended thinking" mode for complex problems
 - More factually accurate than previous Claude models
 - Excels at carefully weighing evidence and uncertainties"""
+    },
+    "claude-3.5-sonnet": {
+        "name": "Claude 3.5 Sonnet",
+        "provider": "Anthropic",
+        "capabilities": ["Balanced performance", "long context", "coding excellence", "tool use"],
+        "optimal_uses": ["Software development", "research synthesis", "document analysis"],
+        "context_window": 200000,
+        "reliability": 0.97,
+        "considerations": """
+- Strong technical accuracy while maintaining approachable tone
+- Excellent at understanding and working within guidelines
+- Native computer/tool use capabilities for complex tasks
+- Maintains context awareness across very lengthy exchanges"""
     },
     "claude-3-haiku": {
+        "name": "Claude 3 Haiku",
+        "provider": "Anthropic",
         "capabilities": ["Speed", "cost-effectiveness", "general-purpose"],
         "optimal_uses": ["Chat applications", "content moderation", "summarization"],
         "context_window": 200000,
@@ -124,19 +419,10 @@ model_guidance = {
 - Consider for high-volume, time-sensitive applications
 - Strong at following specific tonal and formatting guidance
 - May struggle with complex reasoning tasks"""
-    },
-    "gemini-1.5-pro": {
-        "capabilities": ["Long-context reasoning", "multimodal", "multilingual"],
-        "optimal_uses": ["Video analysis", "large document processing", "complex research"],
-        "context_window": 2000000,
-        "reliability": 0.94,
-        "considerations": """
-- Industry-leading 2M token context window
-- Excellent for tasks requiring integration of many documents
-- Can process video, audio, and images natively
-- Consider using more structured prompts for best results"""
     },
     "gemini-2.0-pro": {
+        "name": "Gemini 2.0 Pro",
+        "provider": "Google",
         "capabilities": ["Advanced reasoning", "knowledge-intensive tasks", "coding"],
         "optimal_uses": ["Software development", "complex problem-solving", "technical analysis"],
         "context_window": 2000000,
@@ -148,6 +434,8 @@ model_guidance = {
 - Performs best with clear, structured instructions"""
     },
     "gemini-2.0-flash": {
+        "name": "Gemini 2.0 Flash",
+        "provider": "Google",
         "capabilities": ["Fast responses", "good reasoning", "multimodal"],
         "optimal_uses": ["Real-time applications", "interactive experiences", "general tasks"],
         "context_window": 1000000,
@@ -158,18 +446,22 @@ model_guidance = {
 - Strong balance between performance and efficiency
 - Consider for user-facing applications requiring speed"""
     },
-    "mistral-large-2": {
-        "capabilities": ["Balanced performance", "multilingual", "instruction following"],
-        "optimal_uses": ["Enterprise applications", "customer service", "content generation"],
-        "context_window": 32000,
-        "reliability": 0.95,
+    "gemini-1.5-pro": {
+        "name": "Gemini 1.5 Pro",
+        "provider": "Google",
+        "capabilities": ["Long-context reasoning", "multimodal", "multilingual"],
+        "optimal_uses": ["Video analysis", "large document processing", "complex research"],
+        "context_window": 2000000,
+        "reliability": 0.94,
         "considerations": """
-- Mistral AI's latest enterprise-grade model
-- Strong at following precise instructions and constraints
-- Excels at maintaining consistent tone and voice
-- Good balance of reasoning and creative capabilities"""
+- Industry-leading 2M token context window
+- Excellent for tasks requiring integration of many documents
+- Can process video, audio, and images natively
+- Consider using more structured prompts for best results"""
     },
     "llama-3.1-405b": {
+        "name": "Llama 3.1 405B",
+        "provider": "Open Source",
         "capabilities": ["Open weights", "strong reasoning", "multilingual"],
         "optimal_uses": ["Enterprise deployments", "customized applications", "research"],
         "context_window": 128000,
@@ -181,6 +473,8 @@ model_guidance = {
 - Requires structured prompting for best results"""
     },
     "llama-3.2-1b": {
+        "name": "Llama 3.2 1B",
+        "provider": "Open Source",
         "capabilities": ["Efficiency", "compact size", "on-device deployment"],
         "optimal_uses": ["Edge devices", "mobile applications", "embedded systems"],
         "context_window": 128000,
@@ -190,9 +484,64 @@ model_guidance = {
 - Can run on devices with limited resources
 - Best for simpler, well-defined tasks
 - Performs better with explicit instruction formats"""
+    },
+    "mistral-large-2": {
+        "name": "Mistral Large 2",
+        "provider": "Open Source",
+        "capabilities": ["Balanced performance", "multilingual", "instruction following"],
+        "optimal_uses": ["Enterprise applications", "customer service", "content generation"],
+        "context_window": 32000,
+        "reliability": 0.95,
+        "considerations": """
+- Mistral AI's latest enterprise-grade model
+- Strong at following precise instructions and constraints
+- Excels at maintaining consistent tone and voice
+- Good balance of reasoning and creative capabilities"""
     }
 }
 
+# Everything derived from model_guidance is built once at import, so the
+# table is read-only from here on
+model_guidance = types.MappingProxyType(model_guidance)
+
+def context_label(tokens):
+    """Short context-window label for the model menu, e.g. 128k or 2M."""
+    if tokens >= 1000000:
+        return f"{tokens // 1000000}M"
+    return f"{tokens // 1000}k"
+
+def build_model_options():
+    groups = {}
+    for model, info in model_guidance.items():
+        groups.setdefault(info["provider"], []).append(
+            f'<option value="{model}">{info["name"]} ({context_label(info["context_window"])})</option>'
+        )
+    return "".join(
+        f'<optgroup label="{provider}">{"".join(options)}</optgroup>'
+        for provider, options in groups.items()
+    )
+
+# model_guidance never changes at runtime, so the <select> options and the
+# per-model guidance text used in system prompts are built once at import
+MODEL_OPTIONS_HTML = build_model_options()
+
+DEFAULT_MODEL_GUIDANCE = "General purpose model"
+
+MODEL_GUIDANCE_PROMPT = types.MappingProxyType({
+    model: (
+        f"Model: {info['name']} ({info['provider']})\n"
+        f"Capabilities: {', '.join(info['capabilities'])}\n"
+        f"Optimal uses: {', '.join(info['optimal_uses'])}\n"
+        f"Context window: {info['context_window']} tokens\n"
+        f"Reliability: {info['reliability']}"
+        f"{info['considerations']}"
+    )
+    for model, info in model_guidance.items()
+})
+
+# O(1) membership test for validating the target_model field
+VALID_MODELS = frozenset(model_guidance)
+
 # Define the base HTML template with AJAX form submission and dynamic loader
 BASE_TEMPLATE = """
 <!DOCTYPE html>
@@ -200,460 +549,36 @@ BASE_TEMPLATE = """
 <head>
     <meta charset="UTF-8">
     <title>dePrompt - AI Prompt Engineering Assistant</title>
-    <!-- Google tag (gtag.js) -->
-    <script async src="https://www.googletagmanager.com/gtag/js?id=G-E3QSCYVVRG"></script>
+    <!-- Google tag (gtag.js), fetched on first interaction or once the page is loaded and idle -->
     <script>
         window.dataLayer = window.dataLayer || [];
         function gtag(){dataLayer.push(arguments);}
         gtag('js', new Date());
         gtag('config', 'G-E3QSCYVVRG');
+        // Events queued in dataLayer before the library arrives are replayed by it
+        (function() {
+            var interactions = ['pointerdown', 'keydown', 'scroll'];
+            var loaded = false;
+            function loadTag() {
+                if (loaded) return;
+                loaded = true;
+                interactions.forEach(function(type) { window.removeEventListener(type, loadTag); });
+                var tag = document.createElement('script');
+                tag.async = true;
+                tag.src = 'https://www.googletagmanager.com/gtag/js?id=G-E3QSCYVVRG';
+                document.head.appendChild(tag);
+            }
+            interactions.forEach(function(type) { window.addEventListener(type, loadTag, { passive: true }); });
+            window.addEventListener('load', function() {
+                (window.requestIdleCallback || function(cb) { setTimeout(cb, 1); })(loadTag);
+            });
+        })();
     </script>
     <link rel="stylesheet" href="https://unpkg.com/@atlaskit/css-reset@6.0.1/dist/bundle.css" />
     <link rel="stylesheet" href="https://unpkg.com/@atlaskit/tokens@0.13.0/css/tokens.css" />
-    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;600&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            color-scheme: dark;
-        }
-        
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(10px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-
-        @keyframes slideIn {
-            from { transform: translateX(-20px); opacity: 0; }
-            to { transform: translateX(0); opacity: 1; }
-        }
-
-        body {
-            background-color: var(--ds-surface-raised, #1D2125);
-            color: var(--ds-text, #C7D1DB);
-            font-family: -apple-system, BlinkMacSystemFont, sans-serif;
-            margin: 0;
-            min-height: 100vh;
-            line-height: 1.3;
-        }
-
-        .navbar {
-            background-color: var(--ds-surface-overlay, #22272B);
-            border-bottom: 1px solid var(--ds-border, #404040);
-            padding: 16px 24px;
-            animation: slideIn 0.5s ease-out;
-        }
-
-        .nav-content {
-            max-width: 1200px;
-            margin: 0 auto;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-
-        .nav-brand {
-            color: var(--ds-text-selected, #DEEBFF);
-            font-size: 20px;
-            font-weight: 500;
-            user-select: none;
-        }
-
-        .nav-brand span {
-            color: var(--ds-text-subtle, #9FADBC);
-            font-weight: 300;
-        }
-
-        .nav-links {
-            display: flex;
-            gap: 24px;
-        }
-
-        .nav-link {
-            color: var(--ds-text-subtle, #9FADBC);
-            text-decoration: none;
-            font-size: 14px;
-            font-weight: 500;
-            padding: 8px 12px;
-            border-radius: 3px;
-            transition: all 0.2s ease;
-        }
-
-        .nav-link:hover {
-            color: var(--ds-text-selected, #DEEBFF);
-            background-color: var(--ds-surface-selected, #1D2125);
-        }
-
-        .nav-link.active {
-            color: var(--ds-text-selected, #DEEBFF);
-            background-color: var(--ds-surface-selected, #1D2125);
-        }
-
-        .page-container {
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 32px;
-        }
-
-        .header {
-            margin-bottom: 32px;
-            text-align: center;
-        }
-
-        h1 {
-            color: var(--ds-text-selected, #DEEBFF);
-            font-size: 24px;
-            font-weight: 500;
-            margin-bottom: 4px;
-        }
-
-        .brand-prefix {
-            color: var(--ds-text-subtle, #9FADBC);
-            font-weight: 300;
-            margin-right: 0;
-        }
-
-        .subtitle {
-            color: var(--ds-text-inverse, #FFFFFF);
-            font-size: 12px;
-            font-weight: 500;
-            background-color: var(--ds-background-brand-bold, #0052CC);
-            padding: 4px 8px;
-            border-radius: 3px;
-            margin-top: 8px;
-            display: inline-block;
-        }
-
-        .form-field {
-            margin-bottom: 24px;
-        }
-
-        .form-field:last-child {
-            margin-bottom: 0;
-        }
-
-        label {
-            display: block;
-            color: var(--ds-text-subtle, #9FADBC);
-            font-size: 12px;
-            font-weight: 600;
-            margin-bottom: 4px;
-            text-transform: uppercase;
-        }
-
-        .field-description {
-            color: var(--ds-text-subtlest, #8C9BAB);
-            font-size: 12px;
-            margin-bottom: 8px;
-        }
-
-        select, textarea, .input-container, .user-input {
-            width: 100%;
-            box-sizing: border-box;
-            padding: 8px 12px;
-            border: 2px solid var(--ds-border-input, #404040);
-            border-radius: 3px;
-            background-color: var(--ds-surface-sunken, #161A1D);
-            color: var(--ds-text, #C7D1DB);
-            font-size: 14px;
-            margin-bottom: 16px;
-            transition: all 0.2s ease;
-        }
-
-        select:hover, textarea:hover {
-            background-color: var(--ds-surface-hovered, #1D2125);
-        }
-
-        select:focus, textarea:focus {
-            outline: none;
-            border-color: var(--ds-border-focused, #4C9AFF);
-            background-color: var(--ds-surface-selected, #1D2125);
-        }
-
-        button {
-            width: 100%;
-            padding: 8px 16px;
-            background-color: var(--ds-background-brand-bold, #0052CC);
-            color: var(--ds-text-inverse, #FFFFFF);
-            border: none;
-            border-radius: 3px;
-            font-size: 14px;
-            font-weight: 500;
-            cursor: pointer;
-            transition: all 0.2s ease;
-        }
-
-        button:hover {
-            background-color: var(--ds-background-brand-bold-hovered, #0065FF);
-            transform: translateY(-1px);
-        }
-
-        button:active {
-            background-color: var(--ds-background-brand-bold-pressed, #0747A6);
-            transform: translateY(0);
-        }
-
-        .loading {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(29, 33, 37, 0.85);
-            z-index: 1000;
-            justify-content: center;
-            align-items: center;
-            flex-direction: column;
-        }
-
-        .loading-content {
-            background-color: var(--ds-surface-overlay, #22272B);
-            border-radius: 6px;
-            padding: 24px;
-            text-align: center;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.2);
-            max-width: 400px;
-            width: 90%;
-        }
-
-        .loading-spinner {
-            border: 2px solid var(--ds-border, #404040);
-            border-top: 2px solid var(--ds-background-brand-bold, #0052CC);
-            border-radius: 50%;
-            width: 24px;
-            height: 24px;
-            margin: 0 auto 8px;
-            animation: spin 1s linear infinite, colorPulse 2s linear infinite;
-        }
-
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-
-        @keyframes colorPulse {
-            0% { border-top-color: #0052CC; }
-            25% { border-top-color: #FF6F61; }
-            50% { border-top-color: #FFC107; }
-            75% { border-top-color: #28A745; }
-            100% { border-top-color: #0052CC; }
-        }
-
-        .about-section {
-            background: var(--ds-surface-overlay, #22272B);
-            border-radius: 3px;
-            padding: 24px;
-            margin-bottom: 24px;
-            border: 1px solid var(--ds-border, #404040);
-        }
-
-        .about-section h2 {
-            color: var(--ds-text-selected, #DEEBFF);
-            font-size: 20px;
-            font-weight: 500;
-            margin-bottom: 16px;
-        }
-
-        .about-section p {
-            margin-bottom: 16px;
-            line-height: 1.3;
-        }
-
-        .improved-prompt {
-            background: var(--ds-surface-overlay, #22272B);
-            border-radius: 3px;
-            padding: 24px;
-            margin-bottom: 24px;
-            border: 1px solid var(--ds-border-success, #57D9A3);
-        }
-
-        .info-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 24px;
-            margin-bottom: 24px;
-        }
-
-        .info-card {
-            background: var(--ds-surface-overlay, #22272B);
-            border-radius: 3px;
-            padding: 24px;
-            border: 1px solid var(--ds-border, #404040);
-            overflow-wrap: break-word;
-            word-wrap: break-word;
-            max-width: 100%;
-        }
-
-        .info-card .content {
-            overflow-wrap: break-word;
-            word-wrap: break-word;
-            max-width: 100%;
-        }
-
-        .card-title {
-            color: var(--ds-text-selected, #DEEBFF);
-            font-size: 16px;
-            font-weight: 500;
-            margin-bottom: 16px;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
-
-        .card-title::before {
-            content: '';
-            display: inline-block;
-            width: 8px;
-            height: 8px;
-            background-color: var(--ds-background-brand-bold, #0052CC);
-            border-radius: 50%;
-        }
-
-        .content {
-            white-space: pre-wrap;
-            line-height: 1.5;
-            font-size: 14px;
-            overflow-wrap: break-word;
-            word-wrap: break-word;
-            max-width: 100%;
-        }
-
-        .back-link {
-            display: inline-flex;
-            align-items: center;
-            color: var(--ds-text-link, #4C9AFF);
-            text-decoration: none;
-            font-size: 14px;
-            font-weight: 500;
-        }
-
-        .back-link:hover {
-            color: var(--ds-text-link-hovered, #579DFF);
-            text-decoration: underline;
-        }
-
-        .back-link::before {
-            content: '←';
-            margin-right: 8px;
-        }
-
-        .conversation-area {
-            border: 2px solid var(--ds-border-input, #404040);
-            border-radius: 3px;
-            background-color: var(--ds-surface-sunken, #161A1D);
-            padding: 16px;
-            height: 300px;
-            overflow-y: auto;
-            margin-bottom: 8px;
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .conversation-message {
-            margin-bottom: 12px;
-            padding: 8px 12px;
-            border-radius: 4px;
-            max-width: 85%;
-            word-wrap: break-word;
-        }
-        
-        .system {
-            background-color: var(--ds-surface-overlay, #22272B);
-            align-self: flex-start;
-        }
-        
-        .user {
-            background-color: var(--ds-background-brand-bold, #0052CC);
-            color: white;
-            align-self: flex-end;
-            margin-left: auto;
-        }
-        
-        .input-container {
-            display: flex;
-            padding: 0;
-            border: none;
-        }
-        
-        .user-input {
-            flex-grow: 1;
-            margin-bottom: 0;
-            border-radius: 3px 0 0 3px;
-        }
-        
-        .send-button {
-            width: auto;
-            padding: 8px 16px;
-            border-radius: 0 3px 3px 0;
-            margin: 0;
-        }
-        
-        .toggle-container {
-            margin-bottom: 16px;
-        }
-        
-        .toggle {
-            display: inline-flex;
-            align-items: center;
-            cursor: pointer;
-        }
-        
-        .toggle input {
-            display: none;
-        }
-        
-        .toggle-slider {
-            position: relative;
-            width: 36px;
-            height: 20px;
-            background-color: var(--ds-surface-overlay, #22272B);
-            border-radius: 10px;
-            margin-right: 8px;
-            transition: background-color 0.2s ease;
-        }
-        
-        .toggle-slider:before {
-            content: '';
-            position: absolute;
-            height: 16px;
-            width: 16px;
-            left: 2px;
-            bottom: 2px;
-            background-color: var(--ds-text-subtle, #9FADBC);
-            border-radius: 50%;
-            transition: transform 0.2s ease;
-        }
-        
-        .toggle input:checked + .toggle-slider {
-            background-color: var(--ds-background-brand-bold, #0052CC);
-        }
-        
-        .toggle input:checked + .toggle-slider:before {
-            transform: translateX(16px);
-            background-color: white;
-        }
-        
-        .toggle-label {
-            font-size: 14px;
-            color: var(--ds-text-subtle, #9FADBC);
-        }
-        
-        .thinking-text {
-            animation: pulse 1.5s infinite ease-in-out;
-        }
-        
-        @keyframes pulse {
-            0% { opacity: 0.6; }
-            50% { opacity: 1; }
-            100% { opacity: 0.6; }
-        }
-
-        hr {
-            border: none;
-            border-top: 1px solid var(--ds-border, #404040);
-            margin: 16px 0;
-            max-width: 100%;
-        }
-    </style>
+    <link rel="stylesheet" href="{{ static_url('deprompt.css') }}" />
+    <!-- AJAX submission & dynamic loader script -->
+    <script defer src="{{ static_url('deprompt.js') }}"></script>
 </head>
 <body>
     <nav class="navbar">
@@ -678,162 +603,117 @@ BASE_TEMPLATE = """
             <p id="loaderMessage">dePrompt is enhancing your prompt...</p>
         </div>
     </div>
-
-    <!-- AJAX submission & dynamic loader script -->
-    <script>
-    document.addEventListener('DOMContentLoaded', function() {
-        const messages = [
-            "dePrompt is enhancing your prompt...",
-            "Still brewing the magic...",
-            "Your prompt is being refined...",
-            "Almost there... dePrompt is working its magic...",
-            "Patience! Creating the perfect prompt..."
-        ];
-        const loaderMessage = document.getElementById('loaderMessage');
-        let messageIndex = 0;
-        let interval = null;
-
-        // Track page views and start time tracking
-        gtag('event', 'page_view', {
-            page_title: document.title,
-            page_location: window.location.href
-        });
-
-        // Track time spent on page
-        let startTime = Date.now();
-        window.addEventListener('beforeunload', function() {
-            const timeSpent = Math.round((Date.now() - startTime) / 1000); // Convert to seconds
-            gtag('event', 'time_spent', {
-                time_spent_seconds: timeSpent,
-                page_title: document.title
-            });
-        });
-
-        // Track prompts per session
-        let promptsInSession = 0;
-        const form = document.getElementById('improveForm');
-        if (form) {
-            form.addEventListener('submit', function(e) {
-                e.preventDefault();
-                promptsInSession++;
-                
-                // Track form submission
-                gtag('event', 'prompt_enhancement_started', {
-                    target_model: document.getElementById('target_model').value,
-                    has_context: document.getElementById('context-toggle').checked,
-                    prompts_in_session: promptsInSession
-                });
-
-                // Show loader and start cycling messages
-                document.getElementById('loadingIndicator').style.display = 'flex';
-                interval = setInterval(function() {
-                    messageIndex = (messageIndex + 1) % messages.length;
-                    loaderMessage.textContent = messages[messageIndex];
-                }, 3000);
-
-                // Prepare form data and send AJAX request
-                const formData = new FormData(form);
-                fetch(form.action, {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    // Track successful enhancement
-                    gtag('event', 'prompt_enhancement_completed', {
-                        target_model: document.getElementById('target_model').value,
-                        has_context: document.getElementById('context-toggle').checked,
-                        prompts_in_session: promptsInSession,
-                        success: true
-                    });
-
-                    // Stop loader and update content
-                    clearInterval(interval);
-                    document.getElementById('loadingIndicator').style.display = 'none';
-                    document.getElementById('pageContainer').innerHTML = data.html;
-                })
-                .catch(err => {
-                    // Track error
-                    gtag('event', 'prompt_enhancement_error', {
-                        target_model: document.getElementById('target_model').value,
-                        error_message: err.message,
-                        prompts_in_session: promptsInSession,
-                        success: false
-                    });
-
-                    clearInterval(interval);
-                    document.getElementById('loadingIndicator').style.display = 'none';
-                    alert("An error occurred while processing your request.");
-                });
-            });
-        }
-
-        // Track model selection changes
-        const modelSelect = document.getElementById('target_model');
-        if (modelSelect) {
-            modelSelect.addEventListener('change', function() {
-                gtag('event', 'model_selected', {
-                    model: this.value,
-                    prompts_in_session: promptsInSession
-                });
-            });
-        }
-
-        // Track context toggle
-        const contextToggle = document.getElementById('context-toggle');
-        if (contextToggle) {
-            contextToggle.addEventListener('change', function() {
-                gtag('event', 'context_mode_toggled', {
-                    enabled: this.checked,
-                    prompts_in_session: promptsInSession
-                });
-            });
-        }
-
-        // Enhanced conversation tracking
-        let conversationStartTime = null;
-        let messageCount = 0;
-        const sendButton = document.getElementById('send-button');
-        if (sendButton) {
-            sendButton.addEventListener('click', function() {
-                if (!conversationStartTime) {
-                    conversationStartTime = Date.now();
-                    gtag('event', 'conversation_started', {
-                        prompts_in_session: promptsInSession
-                    });
-                }
-                
-                messageCount++;
-                const userInput = document.getElementById('user-input');
-                const hasInput = userInput.value.trim().length > 0;
-                
-                gtag('event', 'conversation_message_sent', {
-                    has_input: hasInput,
-                    message_count: messageCount,
-                    prompts_in_session: promptsInSession
-                });
-
-                // Track conversation engagement
-                if (messageCount >= 3) {
-                    const conversationDuration = Math.round((Date.now() - conversationStartTime) / 1000);
-                    gtag('event', 'conversation_engaged', {
-                        duration_seconds: conversationDuration,
-                        message_count: messageCount,
-                        prompts_in_session: promptsInSession
-                    });
-                }
-            });
-        }
-    });
-    </script>
 </body>
 </html>
 """
 
-# Route for the home page (AJAX form submission)
-@app.route("/")
-def index():
-    content = """
+# Static asset URLs carry a content hash so browsers can cache them forever
+# and still pick up changes on the next deploy
+@functools.lru_cache(maxsize=None)
+# Content digest of each static asset, read once per process
+@functools.cache
+def static_digest(filename):
+    with open(os.path.join(app.static_folder, filename), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def static_url(filename):
+    return f"{app.static_url_path}/{filename}?v={static_digest(filename)}"
+
+app.jinja_env.globals["static_url"] = static_url
+
+# Gzipped copies of static assets, compressed once per file version
+@functools.lru_cache(maxsize=64)
+def gzip_static(filename, digest):
+    with open(os.path.join(app.static_folder, filename), "rb") as f:
+        return gzip.compress(f.read(), 9)
+
+@app.after_request
+async def cache_static_assets(response):
+    # Only the URL static_url() built is immutable; any other ?v= is served
+    # as a plain static file, so made-up versions cannot churn the gzip cache
+    version = request.args.get("v")
+    if version and response.status_code in (200, 304) and request.path.startswith(app.static_url_path + "/"):
+        filename = request.path[len(app.static_url_path) + 1:]
+        digest = static_digest(filename)
+        if version != digest:
+            return response
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+        response.headers.pop("Expires", None)
+        if response.status_code == 200 and "gzip" in request.headers.get("Accept-Encoding", ""):
+            response.set_data(gzip_static(filename, digest))
+            response.headers["Content-Encoding"] = "gzip"
+            response.vary.add("Accept-Encoding")
+            etag, _ = response.get_etag()
+            if etag:
+                response.set_etag(etag + "-gzip")
+    return response
+
+# Compile the base template once at import instead of re-parsing it per request
+base_template = app.jinja_env.from_string(BASE_TEMPLATE)
+
+def minify_html(html):
+    """Drop HTML comments, indentation and blank lines.
+
+    Newlines are kept so that `//` comments in inline scripts stay terminated.
+    """
+    html = re.sub(r"<!--.*?-->", "", html, flags=re.S)
+    return "\n".join(stripped for stripped in (line.strip() for line in html.splitlines()) if stripped)
+
+def preload_links(html):
+    """Build a Link header announcing a page's stylesheets and scripts.
+
+    Browsers (and proxies that turn it into 103 Early Hints) can start
+    fetching these from the response headers, before the HTML is parsed.
+    """
+    links = [f"<{href}>; rel=preload; as=style"
+             for tag in re.findall(r'<link [^>]*rel="stylesheet"[^>]*>', html)
+             for href in re.findall(r'href="([^"]+)"', tag)]
+    links += [f"<{src}>; rel=preload; as=script"
+              for src in re.findall(r'<script [^>]*src="([^"]+)"', html)]
+    return ", ".join(links)
+
+# Fully rendered pages that never vary per request: name -> (html, gzipped html, etag, Link header)
+static_pages = {}
+
+async def render_static_page(name):
+    """Render a page from PAGE_SOURCES, minify and gzip it, and store the result."""
+    content, context = PAGE_SOURCES[name]
+    html = minify_html(await render_template(base_template, content=content, **context)).encode()
+    page = static_pages[name] = (html, gzip.compress(html, 9), hashlib.sha256(html).hexdigest()[:16],
+                                 preload_links(html.decode()))
+    return page
+
+async def static_page(name):
+    """Serve the stored bytes of a prerendered page.
+
+    The ETag is computed once with the page, so revalidation by browsers or
+    a caching proxy is answered with a bodiless 304.
+    """
+    page = static_pages.get(name)
+    if page is None:
+        page = await render_static_page(name)
+    html, compressed, etag, links = page
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    if use_gzip:
+        etag += "-gzip"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(b"", status=304)
+    elif use_gzip:
+        response = Response(compressed, content_type="text/html; charset=utf-8")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(html, content_type="text/html; charset=utf-8")
+    response.set_etag(etag)
+    response.headers["Link"] = links
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    response.vary.add("Accept-Encoding")
+    return response
+
+# Inner content of the home page (AJAX form submission and conversation script)
+INDEX_CONTENT = """
         <div class="header">
             <h1><span class="brand-prefix">de</span>Prompt</h1>
             <p class="subtitle">AI Prompt Engineering Assistant</p>
@@ -846,35 +726,14 @@ def index():
                     <div class="field-description">Select the model you're writing the prompt for</div>
                     <select id="target_model" name="target_model">
                         <option value="">General Purpose</option>
-                        <optgroup label="OpenAI">
-                            <option value="gpt-4o">GPT-4o (128k)</option>
-                            <option value="gpt-4o-mini">GPT-4o Mini (128k)</option>
-                            <option value="gpt-4.5">GPT-4.5 (128k)</option>
-                            <option value="o3-mini">o3-mini (200k)</option>
-                            <option value="o1">o1 (200k)</option>
-                        </optgroup>
-                        <optgroup label="Anthropic">
-                            <option value="claude-3.7-sonnet">Claude 3.7 Sonnet (200k)</option>
-                            <option value="claude-3.5-sonnet">Claude 3.5 Sonnet (200k)</option>
-                            <option value="claude-3-haiku">Claude 3 Haiku (200k)</option>
-                        </optgroup>
-                        <optgroup label="Google">
-                            <option value="gemini-2.0-pro">Gemini 2.0 Pro (2M)</option>
-                            <option value="gemini-2.0-flash">Gemini 2.0 Flash (1M)</option>
-                            <option value="gemini-1.5-pro">Gemini 1.5 Pro (2M)</option>
-                        </optgroup>
-                        <optgroup label="Open Source">
-                            <option value="llama-3.1-405b">Llama 3.1 405B (128k)</option>
-                            <option value="llama-3.2-1b">Llama 3.2 1B (128k)</option>
-                            <option value="mistral-large-2">Mistral Large 2 (32k)</option>
-                        </optgroup>
+                        """ + MODEL_OPTIONS_HTML + """
                     </select>
                 </div>
 
                 <div class="form-field">
                     <label for="prompt">Original Prompt</label>
                     <div class="field-description">Enter your current prompt for improvement</div>
-                    <textarea id="prompt" name="prompt" placeholder="Enter your original prompt here..." required></textarea>
+                    <textarea id="prompt" name="prompt" placeholder="Enter your original prompt here..." maxlength="8192" required></textarea>
                 </div>
 
                 <div id="context-container">
@@ -894,7 +753,7 @@ def index():
                             </div>
                             <div class="input-container">
                                 <input type="text" id="user-input" placeholder="Type your response here..." class="user-input">
-                                <button type="button" id="send-button" class="send-button">Send</button>
+                                <button type="button" id="send-button" class="send-button" data-action="send">Send</button>
                             </div>
                         </div>
                         <textarea id="context" name="context" placeholder="Describe where and how this prompt will be used..." style="display: none;"></textarea>
@@ -905,207 +764,11 @@ def index():
             <button type="submit" id="enhance-button">Enhance Prompt</button>
         </form>
 
-        <script>
-            document.addEventListener('DOMContentLoaded', function() {
-                const conversationArea = document.getElementById('conversation-area');
-                const userInput = document.getElementById('user-input');
-                const sendButton = document.getElementById('send-button');
-                const contextField = document.getElementById('context');
-                const enhanceButton = document.getElementById('enhance-button');
-                const contextToggle = document.getElementById('context-toggle');
-                const conversationInterface = document.getElementById('conversation-interface');
-                
-                // Store conversation history
-                let conversationHistory = [];
-                let questionGenerated = false;
-                
-                // Toggle conversation interface
-                contextToggle.addEventListener('change', function() {
-                    if (this.checked) {
-                        conversationInterface.style.display = 'block';
-                        contextField.style.display = 'none';
-                        
-                        // Initialize conversation if it's the first time
-                        if (!questionGenerated) {
-                            // Generate the first question using the model
-                            generateNextQuestion();
-                        }
-                    } else {
-                        conversationInterface.style.display = 'none';
-                        contextField.style.display = 'block';
-                    }
-                });
-                
-                // Enable the enhance button initially since context is optional
-                enhanceButton.disabled = false;
-                
-                // Function to generate the next question using the model
-                function generateNextQuestion() {
-                    // Get the original prompt text
-                    const originalPrompt = document.getElementById('prompt').value.trim();
-                    
-                    // Show loading indicator in conversation area
-                    const thinkingMessage = document.createElement('div');
-                    thinkingMessage.classList.add('conversation-message', 'system', 'thinking-text');
-                    thinkingMessage.textContent = "Thinking of a relevant question...";
-                    conversationArea.appendChild(thinkingMessage);
-                    conversationArea.scrollTop = conversationArea.scrollHeight;
-                    
-                    // Add to history (will be removed after response)
-                    conversationHistory.push({
-                        role: 'system',
-                        content: "Thinking of a relevant question..."
-                    });
-                    
-                    // Make AJAX request to generate question
-                    fetch('/generate_question', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                        },
-                        body: JSON.stringify({
-                            conversation: conversationHistory,
-                            target_model: document.getElementById('target_model').value,
-                            original_prompt: originalPrompt
-                        })
-                    })
-                    .then(response => response.json())
-                    .then(data => {
-                        // Remove the loading message
-                        conversationArea.removeChild(conversationArea.lastChild);
-                        conversationHistory.pop();
-                        
-                        if (data.question) {
-                            // Add the generated question
-                            addMessage(data.question, "system");
-                            questionGenerated = true;
-                        } else if (data.complete) {
-                            // All questions complete - model has enough information
-                            enhanceButton.disabled = false;
-                            addMessage("I have enough information now! You can submit your prompt for enhancement.", "system");
-                            
-                            // Disable the input and send button
-                            userInput.disabled = true;
-                            sendButton.disabled = true;
-                            userInput.placeholder = "Conversation complete";
-                        } else {
-                            // Error occurred
-                            addMessage("I couldn't generate a question. Please provide any additional context you think is relevant.", "system");
-                        }
-                    })
-                    .catch(error => {
-                        // Remove the loading message
-                        conversationArea.removeChild(conversationArea.lastChild);
-                        conversationHistory.pop();
-                        
-                        // Add error message
-                        addMessage("Sorry, there was an error generating a question. Please try again or provide context directly in the text area.", "system");
-                        console.error('Error:', error);
-                    });
-                }
-                
-                // Function to add a message to the conversation
-                function addMessage(text, sender) {
-                    const messageDiv = document.createElement('div');
-                    messageDiv.classList.add('conversation-message', sender);
-                    messageDiv.textContent = text;
-                    conversationArea.appendChild(messageDiv);
-                    conversationArea.scrollTop = conversationArea.scrollHeight;
-                    
-                    // Store in history
-                    conversationHistory.push({
-                        role: sender === 'user' ? 'user' : 'system',
-                        content: text
-                    });
-                    
-                    // Update hidden context field with formatted conversation
-                    updateContextField();
-                }
-                
-                // Function to update the hidden context field
-                function updateContextField() {
-                    let formattedContext = '';
-                    for (let i = 0; i < conversationHistory.length; i += 2) {
-                        if (i < conversationHistory.length) {
-                            const question = conversationHistory[i].content;
-                            const answer = i + 1 < conversationHistory.length ? conversationHistory[i + 1].content : '';
-                            formattedContext += `Q: ${question}\nA: ${answer}\n\n`;
-                        }
-                    }
-                    contextField.value = formattedContext.trim();
-                }
-                
-                // Send button click handler
-                sendButton.addEventListener('click', function() {
-                    const text = userInput.value.trim();
-                    if (text) {
-                        addMessage(text, 'user');
-                        userInput.value = '';
-                        
-                        // Generate the next question
-                        generateNextQuestion();
-                    }
-                });
-                
-                // Handle Enter key press
-                userInput.addEventListener('keypress', function(e) {
-                    if (e.key === 'Enter') {
-                        sendButton.click();
-                        e.preventDefault();
-                    }
-                });
-            });
-        </script>
-    """
-    return render_template_string(BASE_TEMPLATE, content=content, home_active="active", about_active="")
+        <script defer src=\"""" + static_url("conversation.js") + """\"></script>
+"""
 
-# About page (unchanged)
-@app.route("/about")
-def about():
-    content = """
-        <style>
-            .about-grid {
-                display: grid;
-                grid-template-columns: 1fr;
-                gap: 24px;
-            }
-            
-            .about-card {
-                background: var(--ds-surface-overlay, #22272B);
-                border-radius: 6px;
-                padding: 20px;
-                border: 1px solid var(--ds-border, #404040);
-            }
-            
-            .about-card-title {
-                display: flex;
-                align-items: center;
-                margin-bottom: 12px;
-                color: var(--ds-text-selected, #DEEBFF);
-                font-size: 16px;
-                font-weight: 500;
-            }
-            
-            .about-icon {
-                width: 20px;
-                height: 20px;
-                margin-right: 12px;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                color: var(--ds-background-brand-bold, #0052CC);
-            }
-            
-            .about-card-title .brand-prefix {
-                margin-right: 0;
-                margin-left: 4px;
-            }
-            
-            .about-card p {
-                margin: 0;
-            }
-        </style>
-        
+# Inner content of the about page
+ABOUT_CONTENT = """
         <div class="about-grid">
             <div class="about-card">
                 <div class="about-card-title">
@@ -1155,24 +818,32 @@ def about():
                 <p>Purav Bhardwaj. Find him on <a href="https://atlassian.enterprise.slack.com/team/U02EVDVK1BK">Slack</a>.</p>
             </div>
         </div>
-    """
-    return render_template_string(BASE_TEMPLATE, content=content, home_active="", about_active="active")
+"""
 
-# AJAX endpoint for prompt improvement
-@app.route("/improve_prompt", methods=["POST"])
-def improve_prompt():
-    # Simulate delay for testing so the loader cycles through messages
-    time.sleep(3)
-    
-    context = request.form.get("context", "")
-    original_prompt = request.form.get("prompt", "")
-    target_model = request.form.get("target_model", "")
+# Pages served from static_pages: name -> (inner content, template context)
+PAGE_SOURCES = {
+    "index": (INDEX_CONTENT, {"home_active": "active", "about_active": ""}),
+    "about": (ABOUT_CONTENT, {"home_active": "", "about_active": "active"}),
+}
 
-    # Analyze the context for requirements and quality factors
-    context_analysis = client.chat.completions.create(
-        model="o3-mini",
-        messages=[
-            {"role": "system", "content": """You are an expert at analyzing technical contexts and requirements.
+# Render every page at startup so no request pays for Jinja
+@app.before_serving
+async def prerender_pages():
+    for name in PAGE_SOURCES:
+        await render_static_page(name)
+
+# Route for the home page
+@app.route("/")
+async def index():
+    return await static_page("index")
+
+# About page
+@app.route("/about")
+async def about():
+    return await static_page("about")
+
+# System prompt for the context-analysis step
+ANALYSIS_SYSTEM_PROMPT = """You are an expert at analyzing technical contexts and requirements.
 Analyze the given context and prompt to extract key requirements, constraints, and objectives.
 Format your response as JSON with the following structure:
 {
@@ -1200,179 +871,228 @@ For "format_requirements", include specific formatting needs like:
 - Need for examples or demonstrations
 - Necessary structure (lists, paragraphs, code blocks)
 - Length considerations (concise vs. detailed)
-- Tone and style requirements"""},
-            {"role": "user", "content": f"Context: {context}\nOriginal Prompt: {original_prompt}\n\nAnalyze this context and prompt to understand the requirements and constraints."}
-        ]
-    )
-
-    # Parse and trim context analysis output
-    analysis = json.loads(context_analysis.choices[0].message.content)
-    analysis['domain'] = analysis['domain'].strip()
-    analysis['complexity_level'] = analysis['complexity_level'].strip()
-    analysis['critical_requirements'] = [req.strip() for req in analysis['critical_requirements']]
-    analysis['constraints'] = [c.strip() for c in analysis.get('constraints', [])]
-    analysis['success_criteria'] = [s.strip() for s in analysis.get('success_criteria', [])]
-    analysis['risk_factors'] = [r.strip() for r in analysis.get('risk_factors', [])]
-    analysis['format_type'] = analysis.get('format_type', 'other').strip()
-    analysis['format_requirements'] = [f.strip() for f in analysis.get('format_requirements', [])]
-
-    # Prepare system message with explicit instructions for output sections
-    system_message = f"""You are an expert prompt engineer with deep understanding of LLM capabilities and limitations.
-
-CONTEXT ANALYSIS:
-Domain: {analysis['domain']}
-Critical Requirements: {', '.join(analysis['critical_requirements'])}
-Constraints: {', '.join(analysis['constraints'])}
-Success Criteria: {', '.join(analysis['success_criteria'])}
-Risk Factors: {', '.join(analysis['risk_factors'])}
-Complexity: {analysis['complexity_level']}
-Format Type: {analysis['format_type']}
-Format Requirements: {', '.join(analysis['format_requirements'])}
-
-TARGET MODEL CHARACTERISTICS:
-{model_guidance.get(target_model, {}).get('considerations', 'General purpose model')}
-
-PROMPT FORMAT GUIDANCE:
-Based on the domain "{analysis['domain']}", format type "{analysis['format_type']}", and complexity level "{analysis['complexity_level']}", adjust your output format:
+- Tone and style requirements"""
 
-1. For coding/technical tasks:
-   - Use concise, precise language
-   - Include code-like structure with clear delimiters
-   - Specify input/output formats explicitly
-   - Use markdown code blocks for examples
-
-2. For creative writing tasks:
-   - Use more open-ended framing
-   - Include inspirational elements
-   - Balance constraints with creative freedom
-   - Avoid overly rigid structure
-
-3. For analytical/data tasks:
-   - Use clear step-by-step guidance
-   - Specify data handling expectations
-   - Include validation checkpoints
-   - Structure with numbered lists for clarity
-
-4. For conversational/customer service tasks:
-   - Use concise dialogue-like format
-   - Include tone and style guidance
-   - Structure with clear scenarios
-   - Minimize verbose explanatory text
+class ContextAnalysis(msgspec.Struct):
+    """Typed shape of the analysis JSON, decoded directly by msgspec.
 
-5. For academic/research tasks:
-   - Use precise terminology
-   - Structure with clear research methodology
-   - Include citation/reference expectations
-   - Balance detail with clarity
-
-Your task is to substantially improve the provided prompt by incorporating:
-
-1. STRUCTURAL ELEMENTS:
-   - Clear organization appropriate to the domain
-   - Format matching the task's nature (avoid one-size-fits-all structures)
-   - Context-appropriate framing that matches actual use case
-   - Output format instructions tailored to the specific domain
-
-2. PRECISION TECHNIQUES:
-   - Domain-specific constraints and terminology
-   - Specific examples demonstrating expected outputs for this context
-   - Quantitative metrics where applicable to this domain
-   - Clear success criteria definition relevant to this use case
-
-3. MODEL-SPECIFIC OPTIMIZATIONS:
-   - {model_guidance.get(target_model, {}).get('considerations', 'General model guidance')}
-   - Appropriate depth based on model capabilities
-   - Strategic use of few-shot examples if needed
-   - Memory management for context window limitations
-
-4. GUARDRAILS:
-   - Error prevention instructions
-   - Explicit handling of edge cases
-   - Confidence scoring or uncertainty indicators
-   - Fallback mechanisms when appropriate
-
-**IMPORTANT FORMATTING INSTRUCTIONS:**
-1. Match your formatting to the domain and purpose
-2. Avoid unnecessarily verbose or essay-like structures
-3. Use formatting (bullet points, numbering, etc.) appropriate to the context
-4. For simple prompts, keep enhancements simple and focused
-5. For complex prompts, use appropriate structure without overcomplicating
-
-**IMPORTANT:** Your response must include the following sections exactly as shown below:
-
-[Improved Prompt]
-...Your improved prompt here...
-
----
-[Explanation of Changes]
-...Detailed explanation of what was changed and why...
+    Every field has a default so a partial analysis still decodes, and
+    ContextAnalysis() is a usable neutral analysis.
+    """
 
----
-[Additional Considerations]
-...Any further notes or fallback recommendations...
+    domain: str = "general"
+    critical_requirements: list[str] = []
+    constraints: list[str] = []
+    success_criteria: list[str] = []
+    risk_factors: list[str] = []
+    complexity_level: str = "medium"
+    format_type: str = "other"
+    format_requirements: list[str] = []
+    confidence_score: float = 0.0
+
+    def __post_init__(self):
+        # Trim the stray whitespace models tend to leave around values
+        self.domain = self.domain.strip()
+        self.complexity_level = self.complexity_level.strip()
+        self.format_type = self.format_type.strip()
+        self.critical_requirements = [req.strip() for req in self.critical_requirements]
+        self.constraints = [c.strip() for c in self.constraints]
+        self.success_criteria = [s.strip() for s in self.success_criteria]
+        self.risk_factors = [r.strip() for r in self.risk_factors]
+        self.format_requirements = [f.strip() for f in self.format_requirements]
+
+class AnalysisBatch(msgspec.Struct):
+    results: list[ContextAnalysis] = []
+
+# strict=False lets numbers that arrive as strings (e.g. "0.9") still decode
+analysis_decoder = msgspec.json.Decoder(ContextAnalysis, strict=False)
+analysis_batch_decoder = msgspec.json.Decoder(AnalysisBatch, strict=False)
+
+def parse_analysis(text):
+    """Decode a model's analysis JSON, tolerating prose or code fences around it.
+
+    Falls back to the neutral default analysis rather than failing the request.
+    """
+    try:
+        return analysis_decoder.decode(text)
+    except msgspec.DecodeError:
+        pass
+    match = re.search(r"\{.*\}", text, re.S)
+    if match:
+        try:
+            return analysis_decoder.decode(match.group(0))
+        except msgspec.DecodeError:
+            pass
+    count("deprompt_analysis_fallback_total")
+    app.logger.debug("Unparseable analysis reply, using the default: %.100r", text)
+    return ContextAnalysis()
+
+# Extra instructions when several analyses share one completion call
+ANALYSIS_BATCH_INSTRUCTIONS = """
+
+You will receive {count} numbered items, each with its own context and original prompt.
+Analyze every item independently and respond with a JSON object of the form
+{{"results": [...]}} containing exactly {count} analysis objects in item order (index 0..{count_minus_one})."""
+
+# Micro-batching of analysis calls; opt-in because reasoning models such as
+# o1 gain little from sharing a call
+ANALYSIS_BATCHING = os.getenv("ANALYSIS_BATCHING", "").lower() in ("1", "true", "yes")
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", 8))
+ANALYSIS_BATCH_WAIT_MS = int(os.getenv("ANALYSIS_BATCH_WAIT_MS", 25))
+
+class MicroBatcher:
+    """Collect items submitted within a short window and process them together.
+
+    Callers await submit(); a background task drains the queue into batches of
+    up to max_batch_size items, waiting at most max_wait seconds after the
+    first item, and hands each batch to handler(items) -> results.
+    """
 
-Your improved prompt must be clearly superior to the original in structure, clarity, specificity, and alignment with the target model's capabilities while maintaining an appropriate format for the specific use case.
-"""
-    improvement_response = client.chat.completions.create(
+    def __init__(self, handler, max_batch_size, max_wait):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self.task = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without blocking collection of the next batch
+            asyncio.ensure_future(self.dispatch(batch))
+
+    async def dispatch(self, batch):
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+async def analyze_single(context, original_prompt):
+    response = await client.chat.completions.create(
         model="o3-mini",
+        response_format={"type": "json_object"},
         messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": f"Original Prompt: {original_prompt}"}
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Context: {context}\nOriginal Prompt: {original_prompt}\n\nAnalyze this context and prompt to understand the requirements and constraints."}
         ]
     )
+    record_usage("analysis", response.usage)
+    return parse_analysis(response.choices[0].message.content)
+
+async def analyze_batch(items):
+    if len(items) == 1:
+        return [await analyze_single(*items[0])]
+    batch_size = len(items)
+    numbered = "\n\n".join(
+        f"### Item {i}\nContext: {context}\nOriginal Prompt: {original_prompt}"
+        for i, (context, original_prompt) in enumerate(items)
+    )
+    response = await client.chat.completions.create(
+        model="o3-mini",
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT + ANALYSIS_BATCH_INSTRUCTIONS.format(count=batch_size, count_minus_one=batch_size - 1)},
+            {"role": "user", "content": numbered}
+        ]
+    )
+    record_usage("analysis_batch", response.usage)
+    try:
+        results = analysis_batch_decoder.decode(response.choices[0].message.content).results
+    except msgspec.DecodeError:
+        results = []
+    if len(results) != batch_size:
+        # The model lost track of the items; analyze them individually instead
+        return await asyncio.gather(*(analyze_single(*item) for item in items))
+    return results
+
+analysis_batcher = MicroBatcher(analyze_batch, ANALYSIS_BATCH_SIZE, ANALYSIS_BATCH_WAIT_MS / 1000)
+
+@app.before_serving
+async def start_batcher():
+    if ANALYSIS_BATCHING:
+        analysis_batcher.start()
+
+@app.after_serving
+async def stop_batcher():
+    await analysis_batcher.stop()
+
+# Analyses by context and prompt. The analysis does not depend on the target
+# model, so trying a prompt against another model reuses it.
+analysis_cache = ExpiringLFUCache(maxsize=4096, ttl=24 * 60 * 60)
+analysis_semantic_cache = SemanticCache(maxsize=1024, threshold=SEMANTIC_CACHE_THRESHOLD)
+
+async def analyze_context(context, original_prompt):
+    """Return the ContextAnalysis of a context/prompt pair."""
+    def run():
+        if analysis_batcher.running:
+            return analysis_batcher.submit((context, original_prompt))
+        return analyze_single(context, original_prompt)
+
+    def generate():
+        if SEMANTIC_CACHING:
+            return semantic_cached("analysis_semantic", analysis_semantic_cache,
+                                   f"{context}\n{original_prompt}", "", run)
+        return run()
+
+    return await coalesce("analysis", request_key(context, original_prompt), analysis_cache, generate)
+
+# A \uXXXX escape cut off by the chunk boundary, or a high surrogate whose
+# low half has not arrived yet (an emoji split across chunks)
+PARTIAL_ESCAPE_RE = re.compile(r'\\u(?:[dD][89abAB][0-9a-fA-F]{2}(?:\\u[0-9a-fA-F]{0,3})?|[0-9a-fA-F]{0,3})$')
+
+def partial_json_string(text, field_re):
+    """Decoded value so far of the JSON string field that field_re captures,
+    from a streamed reply that may end mid-string."""
+    match = field_re.search(text)
+    if not match:
+        return ""
+    raw = match.group(1)
+    try:
+        return orjson.loads(f'"{raw}"')
+    except orjson.JSONDecodeError:
+        return orjson.loads(f'"{PARTIAL_ESCAPE_RE.sub("", raw)}"')
 
-    # Split the response into sections
-    sections = improvement_response.choices[0].message.content.split("---")
-    improved_prompt = sections[0].strip().replace("[Improved Prompt]", "").strip() if len(sections) >= 1 else "No improved prompt provided."
-    
-    # If there's no explanation provided, generate one
-    explanation = sections[1].strip().replace("[Explanation of Changes]", "").strip() if len(sections) >= 2 and sections[1].strip() else ""
-    
-    if not explanation or explanation == "No explanation provided.":
-        explanation_response = client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": """You are an expert prompt engineer tasked with explaining improvements made to AI prompts.
-                
-Analyze the original and improved prompts, then provide a detailed explanation of the changes and their benefits.
-Focus on:
-1. Structural improvements
-2. Clarity enhancements
-3. Added specificity and constraints
-4. Model-specific optimizations
-5. Guardrails and error prevention
-
-Your explanation should be thorough yet concise, highlighting the most significant improvements and their expected impact."""},
-                {"role": "user", "content": f"Original Prompt:\n{original_prompt}\n\nImproved Prompt:\n{improved_prompt}\n\nExplain the key improvements made and why they matter."}
-            ]
-        )
-        explanation = explanation_response.choices[0].message.content.strip()
-    
-    # If there's no additional considerations provided, generate them
-    considerations = sections[2].strip().replace("[Additional Considerations]", "").strip() if len(sections) >= 3 and sections[2].strip() else ""
-    
-    if not considerations or considerations == "No additional considerations provided.":
-        considerations_response = client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": """You are an expert prompt engineer tasked with providing additional considerations for AI prompts.
-                
-After reviewing the original and improved prompts, provide specific additional considerations that might help the user.
-Focus on:
-1. Alternative approaches that could be considered
-2. Potential limitations of the improved prompt
-3. Model-specific adaptations for different AI models
-4. Testing recommendations to validate effectiveness
-5. Fallback strategies for edge cases
-
-Your considerations should be practical, specific, and immediately useful to the prompt user."""},
-                {"role": "user", "content": f"Original Prompt:\n{original_prompt}\n\nImproved Prompt:\n{improved_prompt}\n\nTarget Model: {target_model}\n\nProvide additional considerations that would be helpful."}
-            ]
-        )
-        considerations = considerations_response.choices[0].message.content.strip()
-
-    # Enhanced validation for improved quality assessment
-    validation_response = client.chat.completions.create(
+async def validate_improvement(context, original_prompt, improved_prompt, analysis, target_model):
+    """Evaluate the improved prompt against the original and the analysis."""
+    response = await client.chat.completions.create(
         model="o3-mini",
         messages=[
             {"role": "system", "content": """Conduct a rigorous evaluation of the improved prompt against the original prompt and requirements.
@@ -1415,12 +1135,14 @@ Assessment criteria (rate each on scale of 1-10):
 Provide a final confidence score (0-1) with two decimal precision and specific recommendations for any remaining improvements.
 
 IMPORTANT: If the enhanced prompt is overly verbose, too essay-like, or uses a structure inappropriate for the domain, flag this issue and suggest specific improvements."""},
-            {"role": "user", "content": f"Original Context: {context}\nOriginal Prompt: {original_prompt}\nImproved Prompt: {improved_prompt}\nRequirements: {json.dumps(analysis)}\nTarget Model: {target_model}\nDomain: {analysis['domain']}\n\nConduct a comprehensive evaluation."}
+            {"role": "user", "content": f"Original Context: {context}\nOriginal Prompt: {original_prompt}\nImproved Prompt: {improved_prompt}\nRequirements: {msgspec.json.encode(analysis).decode()}\nTarget Model: {target_model}\nDomain: {analysis.domain}\n\nConduct a comprehensive evaluation."}
         ]
     )
-    validation_result = validation_response.choices[0].message.content
+    record_usage("validation", response.usage)
+    return response.choices[0].message.content
 
-    content = f"""
+# Results page fragment returned to the browser, minified once at import
+RESULT_TEMPLATE = minify_html("""
         <h2 style="color: var(--ds-text-selected, #DEEBFF); margin-bottom: 32px;"><span class="brand-prefix">de</span>Prompt Results</h2>
         
         <div class="improved-prompt" style="margin-top: 16px;">
@@ -1431,14 +1153,14 @@ IMPORTANT: If the enhanced prompt is overly verbose, too essay-like, or uses a s
             <div class="info-card">
                 <div class="card-title">Context Analysis</div>
                 <div class="content">
-                    <strong>Domain:</strong> {analysis['domain']}<br>
-                    <strong>Format Type:</strong> {analysis['format_type']}<br>
-                    <strong>Complexity:</strong> {analysis['complexity_level']}<br>
+                    <strong>Domain:</strong> {domain}<br>
+                    <strong>Format Type:</strong> {format_type}<br>
+                    <strong>Complexity:</strong> {complexity_level}<br>
                     <strong>Critical Requirements:</strong><br>
-                    {"<br>".join(f"• {req}" for req in analysis['critical_requirements'])}
+                    {critical_requirements}
                     <br><br>
                     <strong>Format Requirements:</strong><br>
-                    {"<br>".join(f"• {req}" for req in analysis['format_requirements'])}
+                    {format_requirements}
                 </div>
             </div>
 
@@ -1459,99 +1181,808 @@ IMPORTANT: If the enhanced prompt is overly verbose, too essay-like, or uses a s
         </div>
         
         <a href="/" class="back-link">Create Another Prompt</a>
-    """
+""")
 
-    # Return the inner content as JSON (to be injected via AJAX)
-    return jsonify({"html": content})
+IMPROVEMENT_SYSTEM_PROMPT = """You are an expert prompt engineer with deep understanding of LLM capabilities and limitations.
 
-# API endpoint for generating conversation questions
-@app.route("/generate_question", methods=["POST"])
-def generate_question():
-    data = request.json
-    conversation = data.get('conversation', [])
-    target_model = data.get('target_model', '')
-    original_prompt = data.get('original_prompt', '')
-    
-    # Determine if this is the first question or a follow-up
-    is_first_question = len(conversation) == 0
-    
-    # Create a system prompt for the question generation
-    if is_first_question:
-        system_prompt = f"""You are an expert prompt engineer who helps improve AI prompts with focused questions.
-Your goal: Gather essential context to improve the prompt's effectiveness.
+The user message gives a context analysis of the prompt, then the original prompt.
 
-IMPORTANT: Ask ONE critical question (10 words max) that would most improve the prompt's clarity, effectiveness, or alignment with the target model.
+TARGET MODEL CHARACTERISTICS:
+{model_guidance}
 
-Original prompt:
-{original_prompt}
+PROMPT FORMAT GUIDANCE:
+Based on the domain, format type, and complexity level in the context analysis, adjust your output format:
 
-Target model info:
-{model_guidance.get(target_model, {}).get('considerations', 'General purpose model')}
+1. For coding/technical tasks:
+   - Use concise, precise language
+   - Include code-like structure with clear delimiters
+   - Specify input/output formats explicitly
+   - Use markdown code blocks for examples
 
-Provide a single, clear, ultra-brief question focusing on the most critical missing information that would help improve the prompt's effectiveness."""
-    else:
-        # Extract previous questions and answers
-        qa_pairs = []
-        for i in range(0, len(conversation), 2):
-            if i + 1 < len(conversation):
-                qa_pairs.append({
-                    "question": conversation[i]["content"],
-                    "answer": conversation[i + 1]["content"]
-                })
-        
-        # Analyze what we know and what we need to ask next
-        system_prompt = f"""You are an expert prompt engineer focused on gathering comprehensive context.
-Your goal: Ensure we have all necessary information to improve the prompt effectively.
+2. For creative writing tasks:
+   - Use more open-ended framing
+   - Include inspirational elements
+   - Balance constraints with creative freedom
+   - Avoid overly rigid structure
+
+3. For analytical/data tasks:
+   - Use clear step-by-step guidance
+   - Specify data handling expectations
+   - Include validation checkpoints
+   - Structure with numbered lists for clarity
+
+4. For conversational/customer service tasks:
+   - Use concise dialogue-like format
+   - Include tone and style guidance
+   - Structure with clear scenarios
+   - Minimize verbose explanatory text
+
+5. For academic/research tasks:
+   - Use precise terminology
+   - Structure with clear research methodology
+   - Include citation/reference expectations
+   - Balance detail with clarity
+
+Your task is to substantially improve the provided prompt by incorporating:
+
+1. STRUCTURAL ELEMENTS:
+   - Clear organization appropriate to the domain
+   - Format matching the task's nature (avoid one-size-fits-all structures)
+   - Context-appropriate framing that matches actual use case
+   - Output format instructions tailored to the specific domain
+
+2. PRECISION TECHNIQUES:
+   - Domain-specific constraints and terminology
+   - Specific examples demonstrating expected outputs for this context
+   - Quantitative metrics where applicable to this domain
+   - Clear success criteria definition relevant to this use case
+
+3. MODEL-SPECIFIC OPTIMIZATIONS:
+   - Apply the target model characteristics listed above
+   - Appropriate depth based on model capabilities
+   - Strategic use of few-shot examples if needed
+   - Memory management for context window limitations
+
+4. GUARDRAILS:
+   - Error prevention instructions
+   - Explicit handling of edge cases
+   - Confidence scoring or uncertainty indicators
+   - Fallback mechanisms when appropriate
+
+**IMPORTANT FORMATTING INSTRUCTIONS:**
+1. Match your formatting to the domain and purpose
+2. Avoid unnecessarily verbose or essay-like structures
+3. Use formatting (bullet points, numbering, etc.) appropriate to the context
+4. For simple prompts, keep enhancements simple and focused
+5. For complex prompts, use appropriate structure without overcomplicating
+
+**IMPORTANT:** Respond with a JSON object with exactly these fields:
+- "improved_prompt": your improved prompt
+- "explanation": a detailed explanation of what was changed and why
+- "considerations": any further notes or fallback recommendations
+
+Your improved prompt must be clearly superior to the original in structure, clarity, specificity, and alignment with the target model's capabilities while maintaining an appropriate format for the specific use case.
+"""
 
-Original prompt:
-{original_prompt}
+# The complete improvement instructions per target model, built at import.
+# Nothing per request goes in the system message, so each model's prefix is
+# byte-identical across requests and served from OpenAI's prompt cache; the
+# analysis and prompt follow in the user message.
+IMPROVEMENT_PROMPTS = types.MappingProxyType({
+    model: IMPROVEMENT_SYSTEM_PROMPT.replace("{model_guidance}", guidance)
+    for model, guidance in {**MODEL_GUIDANCE_PROMPT, "": DEFAULT_MODEL_GUIDANCE}.items()
+})
+
+# Structured output guarantees all three parts arrive in the one call
+IMPROVEMENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "improvement",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "improved_prompt": {"type": "string"},
+                "explanation": {"type": "string"},
+                "considerations": {"type": "string"},
+            },
+            "required": ["improved_prompt", "explanation", "considerations"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-Conversation so far:
-{json.dumps(qa_pairs, indent=2)}
+class ImprovementReply(msgspec.Struct):
+    improved_prompt: str = ""
+    explanation: str = ""
+    considerations: str = ""
 
-Target model info:
-{model_guidance.get(target_model, {}).get('considerations', 'General purpose model')}
+    def __post_init__(self):
+        self.improved_prompt = self.improved_prompt.strip()
+        self.explanation = self.explanation.strip()
+        self.considerations = self.considerations.strip()
 
-Instructions:
-1. Review the conversation history and determine if we have gathered enough context to make meaningful prompt improvements.
-2. Consider these key areas:
-   - Use case and intended audience
-   - Specific requirements and constraints
-   - Success criteria and quality expectations
-   - Error handling and edge cases
-   - Model-specific considerations
-   - Performance and efficiency needs
-   - Security and compliance requirements
-   - Integration and compatibility needs
+improvement_decoder = msgspec.json.Decoder(ImprovementReply)
 
-3. If ANY of these areas are unclear or missing, ask ONE ultra-brief question (10 words max) about the most critical missing information.
-4. Only respond with "COMPLETE" if we have gathered sufficient information across ALL key areas.
+# The improved prompt streamed so far
+IMPROVED_PROMPT_FIELD_RE = re.compile(r'"improved_prompt"\s*:\s*"((?:[^"\\]|\\.)*)')
 
-Remember: It's better to ask one more question than to miss critical context."""
+def decode_improvement(text):
+    """Decode an improvement reply; a reply cut short (length limit) keeps
+    whatever improved prompt it got to."""
+    try:
+        return improvement_decoder.decode(text)
+    except msgspec.DecodeError:
+        return ImprovementReply(improved_prompt=partial_json_string(text, IMPROVED_PROMPT_FIELD_RE))
 
+def parse_improvement(text):
+    """decode_improvement for the live pipeline, counting and logging replies
+    that were cut short."""
     try:
-        # Call the OpenAI API to generate the next question
-        response = client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": "Generate the next question to ask."}
-            ]
-        )
-        
-        question = response.choices[0].message.content.strip()
-        
-        # Check if we have enough information
-        if question.upper() == "COMPLETE":
-            return jsonify({"complete": True})
-        
-        return jsonify({"question": question})
+        return improvement_decoder.decode(text)
+    except msgspec.DecodeError:
+        count("deprompt_improvement_fallback_total")
+        app.logger.warning("Incomplete improvement reply, keeping the partial prompt")
+        return decode_improvement(text)
+
+def improvement_messages(original_prompt, target_model, analysis):
+    # Static instructions first, everything that varies after them
+    user_message = f"""CONTEXT ANALYSIS:
+Domain: {analysis.domain}
+Critical Requirements: {', '.join(analysis.critical_requirements)}
+Constraints: {', '.join(analysis.constraints)}
+Success Criteria: {', '.join(analysis.success_criteria)}
+Risk Factors: {', '.join(analysis.risk_factors)}
+Complexity: {analysis.complexity_level}
+Format Type: {analysis.format_type}
+Format Requirements: {', '.join(analysis.format_requirements)}
+
+Original Prompt: {original_prompt}"""
+    return [
+        {"role": "system", "content": IMPROVEMENT_PROMPTS.get(target_model, IMPROVEMENT_PROMPTS[""])},
+        {"role": "user", "content": user_message}
+    ]
+
+# Run the full analysis -> improvement -> validation pipeline and build the result HTML
+async def run_improvement(context, original_prompt, target_model, on_delta=None):
+    started = time.monotonic()
+
+    # Analyze the context for requirements and quality factors
+    analysis = await analyze_context(context, original_prompt)
+
+    stream = await client.chat.completions.create(
+        model="o3-mini",
+        messages=improvement_messages(original_prompt, target_model, analysis),
+        response_format=IMPROVEMENT_RESPONSE_FORMAT,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+
+    # Forward the improved prompt to the caller as it is generated
+    text = ""
+    sent = ""
+    async for chunk in stream:
+        # Usage arrives on a final chunk without choices
+        if chunk.usage is not None:
+            record_usage("improvement", chunk.usage)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        text += chunk.choices[0].delta.content
+        if on_delta is not None:
+            # The preview is best effort: a chunk it cannot decode yet is
+            # skipped, and the final reply is parsed from the full text
+            try:
+                preview = partial_json_string(text, IMPROVED_PROMPT_FIELD_RE)
+            except orjson.JSONDecodeError:
+                continue
+            if len(preview) > len(sent):
+                on_delta(preview[len(sent):])
+                sent = preview
+
+    reply = parse_improvement(text)
+    improved_prompt = reply.improved_prompt or "No improved prompt provided."
+    explanation = reply.explanation or "No explanation provided."
+    considerations = reply.considerations or "No additional considerations provided."
+
+    validation_result = await validate_improvement(context, original_prompt, improved_prompt, analysis, target_model)
+    app.logger.debug("Improvement pipeline for %r took %.2fs",
+                     target_model or "general", time.monotonic() - started)
+
+    # Model output is text, not markup: escape every value exactly once here
+    return RESULT_TEMPLATE.format_map({
+        "improved_prompt": escape(improved_prompt),
+        "domain": escape(analysis.domain),
+        "format_type": escape(analysis.format_type),
+        "complexity_level": escape(analysis.complexity_level),
+        "critical_requirements": "<br>".join("• " + escape(req) for req in analysis.critical_requirements),
+        "format_requirements": "<br>".join("• " + escape(req) for req in analysis.format_requirements),
+        "explanation": escape(explanation),
+        "considerations": escape(considerations),
+        "validation_result": escape(validation_result),
+    })
+
+# Results pages by embedding of the submission, used when SEMANTIC_CACHING is on
+improvement_semantic_cache = SemanticCache(maxsize=1024, threshold=SEMANTIC_CACHE_THRESHOLD)
+
+# Seconds to stall /improve_prompt when running in debug mode (0 disables)
+SIMULATE_DELAY = float(os.getenv("SIMULATE_DELAY", 0))
+
+def server_event(event, data):
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+def event_stream(result, deltas, final, log_message, error_message):
+    """Relay text pushed onto deltas as "delta" events until the result task
+    finishes, then send final(result) as the "done" event."""
+    async def events():
+        while not result.done():
+            next_delta = asyncio.ensure_future(deltas.get())
+            await asyncio.wait({result, next_delta}, return_when=asyncio.FIRST_COMPLETED)
+            if next_delta.done():
+                yield server_event("delta", {"text": next_delta.result()})
+            else:
+                next_delta.cancel()
+        while not deltas.empty():
+            yield server_event("delta", {"text": deltas.get_nowait()})
+        if result.exception() is not None:
+            app.logger.error(log_message, exc_info=result.exception())
+            yield server_event("error", {"error": error_message})
+        else:
+            yield server_event("done", final(result.result()))
+
+    response = Response(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # Model calls can outlast RESPONSE_TIMEOUT; let the stream run to completion
+    response.timeout = None
+    return response
+
+# AJAX endpoint for prompt improvement
+@app.route("/improve_prompt", methods=["POST"])
+async def improve_prompt():
+    # Simulated delay for exercising the loader locally; never applies in production
+    if app.debug and SIMULATE_DELAY:
+        await asyncio.sleep(SIMULATE_DELAY)
+
+    form = await request.form
+    # Normalized so resubmissions differing only in whitespace share the cache
+    context = normalize_text(form.get("context", ""))
+    original_prompt = normalize_text(form.get("prompt", ""))
+    target_model = form.get("target_model", "")
+    if target_model and target_model not in VALID_MODELS:
+        return json_bytes(UNKNOWN_MODEL_JSON, 400)
+    if len(original_prompt) > MAX_PROMPT_CHARS or len(context) > MAX_CONTEXT_CHARS:
+        return json_bytes(PROMPT_TOO_LARGE_JSON, 413)
+
+    # Identical concurrent submissions share one pipeline run, and repeats
+    # within the cache TTL skip the API entirely
+    key = request_key(target_model, context, original_prompt)
+    deltas = asyncio.Queue()
+    def generate():
+        run = lambda: run_improvement(context, original_prompt, target_model, on_delta=deltas.put_nowait)
+        if SEMANTIC_CACHING:
+            # Near-duplicate submissions for the same target model get the
+            # earlier results page
+            return semantic_cached("improvement_semantic", improvement_semantic_cache,
+                                   f"{context}\n{original_prompt}", target_model, run)
+        return run()
+    result = asyncio.ensure_future(coalesce("improvement", key, improvement_cache, generate))
+
+    # Stream the improved prompt as server-sent events while the pipeline runs,
+    # then send the finished results page. Cache hits and requests that join
+    # someone else's run only get the final event.
+    return event_stream(result, deltas, lambda html: {"html": html},
+                        "Prompt improvement failed", "The prompt could not be improved")
+
+# Question-generation instructions. They are byte-identical on every turn and
+# sent first, so OpenAI's automatic prompt caching can reuse the prefix; the
+# original prompt and conversation come after them
+FIRST_QUESTION_SYSTEM_PROMPT = """You are an expert prompt engineer who improves AI prompts with focused questions.
+Ask ONE question (10 words max) about the missing information that would most improve the prompt's clarity, effectiveness, or fit for the target model."""
+
+FOLLOW_UP_SYSTEM_PROMPT = """You are an expert prompt engineer gathering the context needed to improve a prompt.
+Key areas: use case and audience, requirements and constraints, success criteria, edge cases and error handling, model-specific needs, performance, security and compliance, integration.
+If any area is unclear or missing from the conversation, ask ONE question (10 words max) about the most critical gap.
+Set "done" to true with an empty "question" only when every area is covered; when unsure, ask."""
+
+def per_model_prompts(base):
+    """base plus the target model info, prebuilt for every model ("" is general purpose)."""
+    prompts = {model: f"{base}\n\nTarget model info:\n{guidance}"
+               for model, guidance in MODEL_GUIDANCE_PROMPT.items()}
+    prompts[""] = f"{base}\n\nTarget model info:\n{DEFAULT_MODEL_GUIDANCE}"
+    return types.MappingProxyType(prompts)
+
+# Complete question-generation system prompts per target model, so each
+# model's prefix is byte-identical on every turn
+FIRST_QUESTION_PROMPTS = per_model_prompts(FIRST_QUESTION_SYSTEM_PROMPT)
+FOLLOW_UP_PROMPTS = per_model_prompts(FOLLOW_UP_SYSTEM_PROMPT)
+
+# Structured reply for question generation: either the next question or done
+QUESTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "next_question",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "done": {"type": "boolean"},
+                "question": {"type": "string"},
+            },
+            "required": ["done", "question"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# With QUESTION_PLANNING the reply also lists the questions the model would
+# ask next, so later turns can be served without a call
+QUESTION_PLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "next_questions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "done": {"type": "boolean"},
+                "question": {"type": "string"},
+                "follow_ups": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["done", "question", "follow_ups"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+class QuestionReply(msgspec.Struct):
+    done: bool = False
+    question: str = ""
+    follow_ups: list = []
+
+question_decoder = msgspec.json.Decoder(QuestionReply)
+
+# Exact-match cache of generated questions; QUESTION_CACHING=false turns it
+# off, e.g. when sampling variety between replays matters
+QUESTION_CACHING = os.getenv("QUESTION_CACHING", "true").lower() in ("1", "true", "yes")
+question_cache = ExpiringLFUCache(maxsize=4096, ttl=60 * 60)
+question_semantic_cache = SemanticCache(maxsize=1024, threshold=SEMANTIC_CACHE_THRESHOLD)
+
+# Opt-in: each question call also returns up to QUESTION_PLAN_SIZE ranked
+# follow-up questions, asked on the next turns without calling the model.
+# Planned questions cannot react to the answers given in between, and the
+# model only gets to say the conversation is done once the plan runs out.
+QUESTION_PLANNING = os.getenv("QUESTION_PLANNING", "").lower() in ("1", "true", "yes")
+QUESTION_PLAN_SIZE = 3
+# Remaining plan per conversation state: (question just asked, follow-ups)
+question_plans = ExpiringLFUCache(maxsize=4096, ttl=60 * 60)
+
+# The question text streamed so far, and the opening "done" value
+QUESTION_FIELD_RE = re.compile(r'"question"\s*:\s*"((?:[^"\\]|\\.)*)')
+QUESTION_DONE_RE = re.compile(r'"done"\s*:\s*(true|false)')
+
+# Question models, cheapest first. A ten-word question rarely needs a
+# reasoning model, so the next tier is only asked when the one before it is
+# unsure whether the conversation is done. o3-mini takes no temperature or
+# logprobs, and its completion budget also covers its reasoning tokens.
+QUESTION_MODEL_TIERS = ["gpt-4o-mini", "o3-mini"]
+QUESTION_MODEL_OPTIONS = {
+    "gpt-4o-mini": {"max_tokens": 40, "temperature": 0.3, "logprobs": True},
+    "o3-mini": {"max_completion_tokens": 1024, "reasoning_effort": "low"},
+}
+# Below this log probability (about 37%) for the "done" value, escalate
+ESCALATION_LOGPROB = -1.0
+# A question call that has not answered by then is retried rather than
+# leaving the user waiting on the full 60s client timeout
+QUESTION_TIMEOUT = 20.0
+
+async def ask_question_with(model, system_prompt, user_message, on_delta, escalate):
+    """Stream one model's reply; None when escalate is set and the model is
+    unsure whether the conversation is done."""
+    options = dict(QUESTION_MODEL_OPTIONS[model])
+    if QUESTION_PLANNING and "max_tokens" in options:
+        # Room for the follow-up questions after the question itself
+        options["max_tokens"] *= 1 + QUESTION_PLAN_SIZE
+    stream = await client.chat.completions.create(
+        model=model,
+        response_format=QUESTION_PLAN_RESPONSE_FORMAT if QUESTION_PLANNING else QUESTION_RESPONSE_FORMAT,
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=QUESTION_TIMEOUT,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        **options
+    )
+    text = ""
+    sent = ""
+    # End offset in text and log probability of each token received
+    tokens = []
+    checked = False
+    async for chunk in stream:
+        if chunk.usage is not None:
+            record_usage("question", chunk.usage)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        text += chunk.choices[0].delta.content
+        if chunk.choices[0].logprobs and chunk.choices[0].logprobs.content:
+            end = tokens[-1][0] if tokens else 0
+            for token in chunk.choices[0].logprobs.content:
+                end += len(token.token)
+                tokens.append((end, token.logprob))
+        # "done" comes first in the schema, so both the model's confidence and
+        # a finished conversation are known from the opening tokens
+        done = QUESTION_DONE_RE.search(text)
+        if done and not checked:
+            checked = True
+            logprob = next((lp for end, lp in tokens if end > done.start(1)), 0.0)
+            if escalate and logprob < ESCALATION_LOGPROB:
+                await stream.close()
+                return None
+            if done.group(1) == "true":
+                await stream.close()
+                return QuestionReply(done=True)
+        if on_delta is not None:
+            question = partial_json_string(text, QUESTION_FIELD_RE)
+            if len(question) > len(sent):
+                on_delta(question[len(sent):])
+                sent = question
+    return question_decoder.decode(text)
+
+async def ask_question(system_prompt, user_message, on_delta=None):
+    # The JSON schema makes "done" a field instead of a magic string, and its
+    # log probability tells how sure the model is
+    for tier, model in enumerate(QUESTION_MODEL_TIERS):
+        escalate = tier + 1 < len(QUESTION_MODEL_TIERS)
+        reply = await ask_question_with(model, system_prompt, user_message, on_delta, escalate)
+        if reply is not None:
+            count("deprompt_question_model_total", model=model)
+            return reply
+        count("deprompt_question_escalations_total", model=model)
+
+# Answered questions sent verbatim with each follow-up request. Older answers
+# are folded into a summary in blocks of this size, so the summary changes
+# (and costs a call) once every HISTORY_KEEP_TURNS answers and is otherwise
+# served from cache; between 6 and 11 answers go verbatim.
+HISTORY_KEEP_TURNS = 6
+
+# Limits on the conversation a client may send: messages beyond the latest
+# MAX_CONVERSATION_MESSAGES are ignored (the summary covers the whole blocks
+# left inside them; older answers are forgotten), and a conversation over
+# MAX_CONVERSATION_CHARS is rejected
+MAX_CONVERSATION_MESSAGES = 40
+MAX_CONVERSATION_CHARS = 50_000
+
+HISTORY_SUMMARY_PROMPT = """Summarize these questions and answers about a prompt the user wants to improve.
+Keep every concrete fact, requirement, constraint and preference the user gave; drop pleasantries.
+Reply with at most five short lines and nothing else."""
+
+history_summary_cache = ExpiringLFUCache(maxsize=1024, ttl=60 * 60)
+
+async def summarize(qa_text):
+    response = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        max_tokens=150,
+        temperature=0,
+        messages=[
+            {"role": "system", "content": HISTORY_SUMMARY_PROMPT},
+            {"role": "user", "content": qa_text}
+        ]
+    )
+    record_usage("history_summary", response.usage)
+    return response.choices[0].message.content.strip()
+
+async def summarize_history(qa_text):
+    """Summary of answers older than the window; "" if it cannot be made, in
+    which case only the recent answers are sent."""
+    try:
+        return await coalesce("history_summary", request_key(qa_text), history_summary_cache,
+                              lambda: summarize(qa_text))
     except Exception as e:
-        print(f"Error generating question: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        app.logger.warning("Summarizing earlier answers failed: %s", e)
+        return ""
+
+def is_answer(question, answer):
+    """Whether answer is the user's reply to the message before it."""
+    return answer.get("role") == "user" and question.get("role") != "user"
+
+def question_message(original_prompt, qa_text="", summary=""):
+    """User message for a question call: the prompt, then any earlier answers."""
+    parts = [f"Original prompt:\n{original_prompt}"]
+    if summary:
+        parts.append(f"Earlier answers, summarized:\n{summary}")
+    if qa_text:
+        parts.append(f"Conversation so far:\n{qa_text}")
+    parts.append("Generate the next question to ask.")
+    if QUESTION_PLANNING:
+        parts.append(f"In follow_ups, list up to {QUESTION_PLAN_SIZE} further questions you expect to "
+                     "ask after it, most important first.")
+    return "\n\n".join(parts)
+
+# Opening questions every prompt needs answered, asked without a model call;
+# the model takes over once they are answered. QUESTION_SEEDING=false has the
+# model ask from the first question on.
+QUESTION_SEEDING = os.getenv("QUESTION_SEEDING", "true").lower() in ("1", "true", "yes")
+SEED_QUESTIONS = ["Who is the target audience?", "What are the must-have constraints?"]
+SEED_QUESTION_EVENTS = [server_event("done", {"question": question}) for question in SEED_QUESTIONS]
+
+# Opt-in: end the conversation without a model call once the prompt and the
+# user's answers (not the questions) mention at least COVERAGE_THRESHOLD of
+# the key areas the follow-up prompt checks. Each area matches only phrases
+# specific to it, so an ordinary prompt does not cover most areas by itself.
+# A phrase match is a weaker signal than the model's own judgement, so this
+# trades some thoroughness for one call per session.
+QUESTION_COVERAGE_CHECK = os.getenv("QUESTION_COVERAGE_CHECK", "").lower() in ("1", "true", "yes")
+COVERAGE_THRESHOLD = 7
+COVERAGE_AREAS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"\b(use cases?|target (audience|users?|readers?)|intended (audience|users?|readers?)|end users?)\b",
+    r"\b(hard (requirements?|constraints?|limits?)|must (not|never|always)|no more than|at most \d+"
+    r"|(word|length|character|token) (limits?|counts?))\b",
+    r"\b(success criteria|acceptance criteria|(success|quality|evaluation) metrics?|measured (by|against))\b",
+    r"\b(edge cases?|error handling|invalid (inputs?|data|requests?)|fall ?backs?|(if|when) \w+ fails)\b",
+    r"\b(gpt-?\d\w*|o[134](-mini)?|claude|gemini|llama|context window|(max|output) tokens|temperature)\b",
+    r"\b(latency|response times?|throughput|requests per (second|minute)"
+    r"|(under|within) \d+ ?(ms|milliseconds|seconds?))\b",
+    r"\b(security|privacy|gdpr|hipaa|pii|personal data|sensitive (data|information)|complian(ce|t))\b",
+    r"\b(integrat(e|es|ed|ion) with|webhooks?|(rest|http|graphql|external|third-party) apis?"
+    r"|apis? (calls?|endpoints?|requests?)|(data|etl|ci/cd) pipelines?|json schema|output format)\b",
+)]
+COMPLETE_EVENT = server_event("done", {"complete": True})
+
+def coverage(text):
+    """Number of key areas text mentions."""
+    return sum(1 for area in COVERAGE_AREAS if area.search(text))
+
+def event_response(body):
+    """A text/event-stream response for events that are already encoded."""
+    response = Response(body, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# API endpoint for generating conversation questions
+@app.route("/generate_question", methods=["POST"])
+async def generate_question():
+    # Parsed by orjson via OrjsonProvider; reject bodies that are not a JSON object
+    data = await request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return json_bytes(NOT_AN_OBJECT_JSON, 400)
+    conversation = data.get('conversation', [])
+    # An absent or empty target_model is general purpose, which the prompt
+    # tables carry under ""
+    target_model = data.get('target_model', '')
+    original_prompt = data.get('original_prompt', '')
+    if not isinstance(target_model, str) or (target_model and target_model not in VALID_MODELS):
+        return json_bytes(UNKNOWN_MODEL_JSON, 400)
+    if not isinstance(original_prompt, str):
+        return json_bytes(BAD_ORIGINAL_PROMPT_JSON, 400)
+    original_prompt = normalize_text(original_prompt)
+    if not isinstance(conversation, list) or not all(
+            isinstance(message, dict) and isinstance(message.get("content"), str) for message in conversation):
+        return json_bytes(BAD_CONVERSATION_JSON, 400)
+    # Bound what one request can make the server process and send upstream
+    if len(original_prompt) > MAX_PROMPT_CHARS:
+        return json_bytes(PROMPT_TOO_LARGE_JSON, 413)
+    if sum(len(message["content"]) for message in conversation) > MAX_CONVERSATION_CHARS:
+        return json_bytes(CONVERSATION_TOO_LARGE_JSON, 413)
+    # Answers in the whole conversation, so the summary blocks below keep
+    # their place in it. The client sends only the latest messages, with the
+    # count of all answers as "answered"; without it, the answers in the
+    # messages received are counted before older ones are cut off.
+    answered = sum(1 for question, answer in zip(conversation, conversation[1:]) if is_answer(question, answer))
+    conversation = conversation[-MAX_CONVERSATION_MESSAGES:]
+    
+    # Pair each user answer with the message just before it (the question);
+    # notices such as error messages that were never answered are skipped
+    qa_pairs = [
+        f"Q: {question['content']}\nA: {answer['content']}"
+        for question, answer in zip(conversation, conversation[1:])
+        if is_answer(question, answer)
+    ]
+    client_answered = data.get('answered')
+    if type(client_answered) is int and client_answered >= answered:
+        answered = client_answered
+    # Only the latest answers are sent verbatim, so input tokens stop growing
+    # with long conversations; the original prompt always goes along. Block
+    # boundaries count from the first answer of the whole conversation, and
+    # only whole blocks still inside the window are summarized, so once the
+    # window is full the summary still changes only twice per block.
+    dropped = answered - len(qa_pairs)
+    summarized = max(0, answered - HISTORY_KEEP_TURNS) // HISTORY_KEEP_TURNS * HISTORY_KEEP_TURNS
+    summary_start = -(-dropped // HISTORY_KEEP_TURNS) * HISTORY_KEEP_TURNS
+    summary_text = "\n".join(qa_pairs[summary_start - dropped:max(0, summarized - dropped)])
+    qa_text = "\n".join(qa_pairs[max(0, summarized - dropped):])
+
+    if QUESTION_SEEDING and len(qa_pairs) < len(SEED_QUESTIONS):
+        count("deprompt_question_model_total", model="seed")
+        return event_response(SEED_QUESTION_EVENTS[len(qa_pairs)])
+
+    if QUESTION_PLANNING and qa_pairs:
+        # The last answer replied to the question a plan was made with: ask
+        # the plan's next question, keeping the rest for the turn after
+        plan = question_plans.get(request_key(target_model, original_prompt, qa_pairs[:-1]))
+        if plan is not None and qa_pairs[-1].startswith(f"Q: {plan[0]}\nA: "):
+            question, *follow_ups = plan[1]
+            if follow_ups:
+                question_plans[request_key(target_model, original_prompt, qa_pairs)] = (question, follow_ups)
+            count("deprompt_question_model_total", model="plan")
+            return event_response(server_event("done", {"question": question}))
+
+    if QUESTION_COVERAGE_CHECK and len(qa_pairs) >= len(SEED_QUESTIONS):
+        answers = [message["content"] for message in conversation if message.get("role") == "user"]
+        if coverage("\n".join([original_prompt, *answers])) >= COVERAGE_THRESHOLD:
+            count("deprompt_question_model_total", model="coverage")
+            return event_response(COMPLETE_EVENT)
+
+    # Determine if this is the first question or a follow-up
+    is_first_question = not qa_pairs
+
+    # The prebuilt per-model system prompt carries the instructions and model
+    # info; the per-conversation details follow in the user message
+    if is_first_question:
+        system_prompt = FIRST_QUESTION_PROMPTS[target_model]
+    else:
+        system_prompt = FOLLOW_UP_PROMPTS[target_model]
+
+    # Replays of the same conversation state (retries, reloads) reuse the
+    # earlier question instead of calling the model again
+    deltas = asyncio.Queue()
+    async def ask():
+        summary = await summarize_history(summary_text) if summary_text else ""
+        user_message = question_message(original_prompt, qa_text, summary)
+        return await ask_question(system_prompt, user_message, on_delta=deltas.put_nowait)
+
+    def generate():
+        if SEMANTIC_CACHING:
+            # Near-duplicate conversations about the same target model and
+            # turn kind get the question asked before
+            namespace = f"{target_model}|{'first' if is_first_question else 'follow-up'}"
+            return semantic_cached("question_semantic", question_semantic_cache,
+                                   f"{original_prompt}\n{qa_text}", namespace, ask)
+        return ask()
+
+    if QUESTION_CACHING:
+        key = request_key(target_model, original_prompt, qa_pairs)
+        result = asyncio.ensure_future(coalesce("question", key, question_cache, generate))
+    else:
+        result = asyncio.ensure_future(generate())
+
+    # The question streams as it is written; "done" carries the whole question,
+    # or complete once the model has enough information
+    def final(reply):
+        if reply.done:
+            return {"complete": True}
+        question = reply.question.strip()
+        follow_ups = [f.strip() for f in reply.follow_ups[:QUESTION_PLAN_SIZE] if f.strip()]
+        if QUESTION_PLANNING and follow_ups:
+            question_plans[request_key(target_model, original_prompt, qa_pairs)] = (question, follow_ups)
+        return {"question": question}
+
+    return event_stream(result, deltas, final,
+                        "Error generating question", "The question could not be generated")
+
+# Prompts accepted by one /batch_improve request
+BATCH_MAX_PROMPTS = 1000
+
+# Opt-in: each batch bills up to BATCH_MAX_PROMPTS completions to the
+# operator's key, so the batch routes exist only with BATCH_API=true and a
+# BATCH_API_TOKEN that callers send as a bearer token
+BATCH_API = os.getenv("BATCH_API", "").lower() in ("1", "true", "yes")
+BATCH_API_TOKEN = os.getenv("BATCH_API_TOKEN", "")
+# Tags the batches this app creates, so polling cannot read other batches in
+# the OpenAI account
+BATCH_METADATA = {"source": "deprompt-batch-improve"}
+
+def batch_auth_error():
+    """Error response when the batch API is off or the caller is not
+    authorized, else None."""
+    if not (BATCH_API and BATCH_API_TOKEN):
+        return json_bytes(NOT_FOUND_JSON, 404)
+    expected = f"Bearer {BATCH_API_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+        return json_bytes(UNAUTHORIZED_JSON, 401)
+    return None
+
+def valid_batch_item(item):
+    """Whether a /batch_improve item has a prompt and only string fields."""
+    return (isinstance(item, dict) and isinstance(item.get("prompt"), str) and item["prompt"]
+            and isinstance(item.get("context", ""), str) and isinstance(item.get("target_model", ""), str))
+
+# Bulk improvement through the OpenAI Batch API: half the token price and a
+# separate rate limit, in exchange for results within 24 hours. Batches skip
+# the live pipeline's analysis and validation calls; each prompt gets a
+# single improvement call with a neutral analysis and its context inline.
+@app.route("/batch_improve", methods=["POST"])
+async def batch_improve():
+    error = batch_auth_error()
+    if error is not None:
+        return error
+    data = await request.get_json(silent=True)
+    prompts = data.get("prompts") if isinstance(data, dict) else None
+    if (not isinstance(prompts, list) or not 0 < len(prompts) <= BATCH_MAX_PROMPTS
+            or not all(valid_batch_item(item) for item in prompts)):
+        return json_bytes(BAD_BATCH_JSON, 400)
+
+    lines = []
+    for i, item in enumerate(prompts):
+        target_model = item.get("target_model", "")
+        if target_model and target_model not in VALID_MODELS:
+            return json_bytes(UNKNOWN_MODEL_JSON, 400)
+        context = normalize_text(item.get("context", ""))
+        prompt = normalize_text(item["prompt"])
+        if len(prompt) > MAX_PROMPT_CHARS or len(context) > MAX_CONTEXT_CHARS:
+            return json_bytes(PROMPT_TOO_LARGE_JSON, 413)
+        messages = improvement_messages(prompt, target_model, ContextAnalysis())
+        if context:
+            messages[1]["content"] = f"Context: {context}\n{messages[1]['content']}"
+        lines.append(orjson.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": "o3-mini", "messages": messages, "response_format": IMPROVEMENT_RESPONSE_FORMAT},
+        }))
+
+    batch_file = await client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata=BATCH_METADATA,
+    )
+    return json_bytes(orjson.dumps({"id": batch.id, "status": batch.status}), 202)
+
+# Poll a batch; once completed, the results come back in submission order
+@app.route("/batch_improve/<batch_id>")
+async def batch_status(batch_id):
+    error = batch_auth_error()
+    if error is not None:
+        return error
+    try:
+        batch = await client.batches.retrieve(batch_id)
+    except NotFoundError:
+        return json_bytes(UNKNOWN_BATCH_JSON, 404)
+    if batch.endpoint != "/v1/chat/completions" or (batch.metadata or {}) != BATCH_METADATA:
+        return json_bytes(UNKNOWN_BATCH_JSON, 404)
+    body = {"id": batch.id, "status": batch.status}
+    if batch.status == "completed":
+        results = {}
+        if batch.output_file_id:
+            output = await client.files.content(batch.output_file_id)
+            for line in output.content.splitlines():
+                entry = orjson.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[entry["custom_id"]] = msgspec.structs.asdict(
+                        decode_improvement(response["body"]["choices"][0]["message"]["content"]))
+        # Requests that failed are listed in the error file, not the output
+        total = batch.request_counts.total if batch.request_counts else len(results)
+        body["results"] = [results.get(str(i), {"error": "The prompt could not be improved"})
+                           for i in range(total)]
+    return json_bytes(orjson.dumps(body))
+
+# Cache effectiveness and other counters for this worker process
+@app.route("/metrics")
+async def metrics_endpoint():
+    lines = []
+    for (name, labels), value in sorted(metrics.items()):
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {value}" if labels else f"{name} {value}")
+    caches = {dict(labels)["cache"] for name, labels in metrics if name == "deprompt_cache_requests_total"}
+    for cache in sorted(caches):
+        hits = metrics[("deprompt_cache_requests_total", (("cache", cache), ("result", "hit")))]
+        total = sum(v for (name, labels), v in metrics.items()
+                    if name == "deprompt_cache_requests_total" and dict(labels)["cache"] == cache)
+        lines.append(f'deprompt_cache_hit_ratio{{cache="{cache}"}} {hits / total:.4f}')
+    # Share of each call's prompt tokens read from OpenAI's prompt cache
+    calls = {dict(labels)["call"] for name, labels in metrics if name == "deprompt_prompt_tokens_total"}
+    for call in sorted(calls):
+        cached = metrics[("deprompt_prompt_tokens_total", (("call", call), ("kind", "cached")))]
+        uncached = metrics[("deprompt_prompt_tokens_total", (("call", call), ("kind", "uncached")))]
+        if cached + uncached:
+            lines.append(f'deprompt_prompt_cache_ratio{{call="{call}"}} {cached / (cached + uncached):.4f}')
+    return "\n".join(lines) + "\n", 200, {"Content-Type": "text/plain; version=0.0.4"}
 
 if __name__ == "__main__":
     # Get port from environment variable for production
     port = int(os.environ.get("PORT", 8000))
-    # Start the Flask server
+    # Start the development server (production runs under gunicorn + uvicorn workers)
     app.run(host='0.0.0.0', port=port, debug=False)
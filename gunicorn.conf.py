@@ -0,0 +1,24 @@
+# Gunicorn settings for dePrompt (loaded automatically from the working directory)
+import multiprocessing
+import os
+
+# Bind to the port provided by the platform, defaulting to the Docker EXPOSE port
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# The app is async (Quart + AsyncOpenAI): each uvicorn worker runs an event
+# loop that parks requests on network I/O, so one worker serves many
+# concurrent OpenAI calls instead of one at a time
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Respect CPU affinity in containers, where cpu_count() reports host cores
+try:
+    _cpus = len(os.sched_getaffinity(0))
+except AttributeError:
+    _cpus = multiprocessing.cpu_count()
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * _cpus + 1))
+
+# Import the app once in the master so .env parsing and the module-level
+# prompt tables are built before forking; workers share those pages
+# copy-on-write. The OpenAI HTTP session is created lazily in each worker.
+preload_app = True
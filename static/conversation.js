@@ -0,0 +1,269 @@
+// Conversation mode on the home page: asks clarifying questions and fills the context field
+document.addEventListener('DOMContentLoaded', function() {
+    const conversationArea = document.getElementById('conversation-area');
+    const userInput = document.getElementById('user-input');
+    const sendButton = document.getElementById('send-button');
+    const contextField = document.getElementById('context');
+    const enhanceButton = document.getElementById('enhance-button');
+    const contextToggle = document.getElementById('context-toggle');
+    const conversationInterface = document.getElementById('conversation-interface');
+
+    // Store conversation history, and count the user's answers in it the way
+    // the server pairs them (a user message after a non-user one)
+    let conversationHistory = [];
+    let answeredCount = 0;
+    // Matches MAX_CONVERSATION_MESSAGES in app.py
+    const MAX_SENT_MESSAGES = 40;
+    let questionGenerated = false;
+    let questionInFlight = false;
+    let conversationComplete = false;
+
+    // Answered Q/A pairs, formatted once, and the question awaiting an answer
+    let answeredContext = '';
+    let openQuestion = null;
+
+    // Run fn at once, then ignore repeat calls until wait ms pass without one
+    function debounce(fn, wait) {
+        let timer = null;
+        return function(...args) {
+            if (timer === null) {
+                fn.apply(this, args);
+            }
+            clearTimeout(timer);
+            timer = setTimeout(() => { timer = null; }, wait);
+        };
+    }
+
+    // Toggle conversation interface
+    contextToggle.addEventListener('change', function() {
+        if (this.checked) {
+            conversationInterface.style.display = 'block';
+            contextField.style.display = 'none';
+
+            // Initialize conversation if it's the first time
+            if (!questionGenerated) {
+                // Generate the first question using the model
+                generateNextQuestion();
+            }
+        } else {
+            syncContextField();
+            conversationInterface.style.display = 'none';
+            contextField.style.display = 'block';
+        }
+    });
+
+    // Enable the enhance button initially since context is optional
+    enhanceButton.disabled = false;
+
+    // Function to generate the next question using the model
+    function generateNextQuestion() {
+        // Only one question request at a time
+        if (questionInFlight) {
+            return;
+        }
+        questionInFlight = true;
+        sendButton.disabled = true;
+
+        // Get the original prompt text
+        const originalPrompt = document.getElementById('prompt').value.trim();
+
+        // The loading indicator is a pseudo-element on the conversation area,
+        // so waiting adds no message node; a draft node is only created once
+        // the question starts streaming in
+        conversationArea.classList.add('thinking');
+        if (!flushScheduled) {
+            requestAnimationFrame(function() {
+                conversationArea.scrollTop = conversationArea.scrollHeight;
+            });
+        }
+        let draft = null;
+
+        // Swap the streamed draft and the loading indicator for the final
+        // message in the same frame the message is inserted
+        function finishThinking() {
+            requestAnimationFrame(function() {
+                conversationArea.classList.remove('thinking');
+                if (draft) {
+                    draft.remove();
+                }
+            });
+        }
+
+        function showQuestion(data) {
+            if (data.question) {
+                // Add the generated question
+                addMessage(data.question, "system");
+                questionGenerated = true;
+            } else if (data.complete) {
+                // All questions complete - model has enough information
+                enhanceButton.disabled = false;
+                addMessage("I have enough information now! You can submit your prompt for enhancement.", "system");
+
+                // Disable the input and send button
+                conversationComplete = true;
+                userInput.disabled = true;
+                userInput.placeholder = "Conversation complete";
+            } else {
+                // Error occurred
+                addMessage("I couldn't generate a question. Please provide any additional context you think is relevant.", "system");
+            }
+            finishThinking();
+        }
+
+        // Make AJAX request to generate question
+        fetch('/generate_question', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            // The server ignores all but the latest MAX_SENT_MESSAGES
+            // messages, so sending only those keeps the request size bounded
+            // however long the conversation gets. The answer count tells it
+            // where the window sits, which keeps its summaries of older
+            // answers aligned and cached
+            body: JSON.stringify({
+                conversation: conversationHistory.slice(-MAX_SENT_MESSAGES),
+                answered: answeredCount,
+                target_model: document.getElementById('target_model').value,
+                original_prompt: originalPrompt
+            })
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Question request failed with status ${response.status}`);
+            }
+            return readEvents(response, function(event, data) {
+                if (event === 'delta') {
+                    // Show the question as it is written
+                    if (draft === null) {
+                        draft = document.createElement('div');
+                        draft.className = 'conversation-message system';
+                        appendMessage(draft);
+                        requestAnimationFrame(function() {
+                            conversationArea.classList.remove('thinking');
+                        });
+                    }
+                    draft.textContent += data.text;
+                } else if (event === 'error') {
+                    throw new Error(data.error);
+                } else if (event === 'done') {
+                    showQuestion(data);
+                }
+            });
+        })
+        .catch(error => {
+            // Replace the loading indicator with an error message
+            addMessage("Sorry, there was an error generating a question. Please try again or provide context directly in the text area.", "system");
+            finishThinking();
+            console.error('Error:', error);
+        })
+        .finally(() => {
+            questionInFlight = false;
+            sendButton.disabled = conversationComplete;
+        });
+    }
+
+    // Messages added within one frame are inserted together and scrolled
+    // into view once, so back-to-back messages cause a single layout. Only
+    // the latest messages stay in the DOM; older ones live on in
+    // conversationHistory and the context field.
+    const MAX_RENDERED_MESSAGES = 40;
+    let pendingMessages = document.createDocumentFragment();
+    let flushScheduled = false;
+    function appendMessage(node) {
+        pendingMessages.appendChild(node);
+        if (!flushScheduled) {
+            flushScheduled = true;
+            requestAnimationFrame(function() {
+                conversationArea.appendChild(pendingMessages);
+                pendingMessages = document.createDocumentFragment();
+                while (conversationArea.childElementCount > MAX_RENDERED_MESSAGES) {
+                    conversationArea.firstElementChild.remove();
+                }
+                conversationArea.scrollTop = conversationArea.scrollHeight;
+                flushScheduled = false;
+            });
+        }
+    }
+
+    // Function to add a message to the conversation
+    function addMessage(text, sender) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'conversation-message ' + sender;
+        messageDiv.textContent = text;
+        appendMessage(messageDiv);
+
+        // Store in history
+        const previous = conversationHistory[conversationHistory.length - 1];
+        if (sender === 'user' && previous && previous.role !== 'user') {
+            answeredCount++;
+        }
+        conversationHistory.push({
+            role: sender === 'user' ? 'user' : 'system',
+            content: text
+        });
+
+        // Update hidden context field with formatted conversation
+        updateContextField(text, sender);
+    }
+
+    // Record the newest message for the context field
+    function updateContextField(text, sender) {
+        if (sender === 'user') {
+            answeredContext += `Q: ${openQuestion === null ? '' : openQuestion}\nA: ${text}\n\n`;
+            openQuestion = null;
+        } else {
+            openQuestion = text;
+        }
+    }
+
+    // The context field is hidden while the conversation is shown, so it is
+    // only written when it becomes visible or the form is submitted
+    function syncContextField() {
+        // Leave context typed by hand alone until the conversation has begun
+        if (!answeredContext && openQuestion === null) {
+            return;
+        }
+        const pending = openQuestion === null ? '' : `Q: ${openQuestion}\nA: `;
+        contextField.value = (answeredContext + pending).trim();
+    }
+
+    // Capture phase on document runs before the form's own submit handler
+    document.addEventListener('submit', syncContextField, true);
+
+    // Send the answer; repeated clicks or Enter presses within 350ms
+    // and answers sent while a question is loading are ignored
+    const sendAnswer = debounce(function() {
+        const text = userInput.value.trim();
+        if (text && !questionInFlight) {
+            addMessage(text, 'user');
+            userInput.value = '';
+            document.dispatchEvent(new CustomEvent('conversation:answer-sent'));
+
+            // Generate the next question
+            generateNextQuestion();
+        }
+    }, 350);
+
+    // One delegated click listener serves every [data-action] button in the
+    // conversation interface, including buttons added with later messages
+    const actions = {
+        send: sendAnswer
+    };
+    conversationInterface.addEventListener('click', function(e) {
+        const button = e.target.closest('[data-action]');
+        if (button && !button.disabled && actions[button.dataset.action]) {
+            actions[button.dataset.action]();
+        }
+    });
+
+    // Handle Enter key press
+    // keydown replaces the deprecated keypress; Enter that confirms an IME
+    // composition is left to the input method
+    userInput.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter' && !e.isComposing) {
+            sendAnswer();
+            e.preventDefault();
+        }
+    });
+});
@@ -0,0 +1,243 @@
+// AJAX submission, dynamic loader and analytics for every dePrompt page
+
+// Parse a text/event-stream response body, calling onEvent for each event.
+// Resolves once a "done" event arrives and rejects if the stream ends first.
+function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            if (done) {
+                throw new Error('The response ended before the results arrived');
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) {
+                        event = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                });
+                onEvent(event, JSON.parse(data));
+                if (event === 'done') {
+                    reader.cancel();
+                    return;
+                }
+            }
+            return pump();
+        });
+    }
+    return pump();
+}
+
+// Loaded before conversation.js, which uses readEvents for streamed questions
+document.addEventListener('DOMContentLoaded', function() {
+    const messages = [
+        "dePrompt is enhancing your prompt...",
+        "Still brewing the magic...",
+        "Your prompt is being refined...",
+        "Almost there... dePrompt is working its magic...",
+        "Patience! Creating the perfect prompt..."
+    ];
+    const loaderMessage = document.getElementById('loaderMessage');
+    let messageIndex = 0;
+    let interval = null;
+
+    // Analytics events are queued and handed to gtag together, every 5s, when
+    // 20 are waiting, or when the page is hidden, so gtag.js can pack them
+    // into as few collect requests as possible
+    const gaQueue = [];
+    function queueEvent(name, params) {
+        gaQueue.push({ name: name, params: params });
+        if (gaQueue.length >= 20) {
+            flushEvents();
+        }
+    }
+    function flushEvents() {
+        gaQueue.splice(0).forEach(function(event) {
+            gtag('event', event.name, Object.assign({ transport_type: 'beacon' }, event.params));
+        });
+    }
+    setInterval(flushEvents, 5000);
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flushEvents();
+        }
+    });
+
+    // Track page views and start time tracking
+    queueEvent('page_view', {
+        page_title: document.title,
+        page_location: window.location.href
+    });
+
+    // Track time spent on page. pagehide fires on mobile and in Safari where
+    // beforeunload does not, and unlike beforeunload it leaves the page
+    // eligible for the back/forward cache
+    let startTime = Date.now();
+    window.addEventListener('pagehide', function() {
+        const timeSpent = Math.round((Date.now() - startTime) / 1000); // Convert to seconds
+        queueEvent('time_spent', {
+            time_spent_seconds: timeSpent,
+            page_title: document.title
+        });
+        flushEvents();
+    });
+
+    // Replace the form with a results heading and an empty improved prompt
+    // box, returning the element the streamed text is appended to
+    function showPreview() {
+        const container = document.getElementById('pageContainer');
+        container.innerHTML = '<h2 style="color: var(--ds-text-selected, #DEEBFF); margin-bottom: 32px;">' +
+            '<span class="brand-prefix">de</span>Prompt Results</h2>' +
+            '<div class="improved-prompt" style="margin-top: 16px;"><div class="content streaming"></div></div>' +
+            '<p class="stream-status">Analyzing the changes...</p>';
+        return container.querySelector('.content.streaming');
+    }
+
+    // Track prompts per session
+    let promptsInSession = 0;
+    const form = document.getElementById('improveForm');
+    if (form) {
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+            promptsInSession++;
+
+            // Track form submission
+            queueEvent('prompt_enhancement_started', {
+                target_model: document.getElementById('target_model').value,
+                has_context: document.getElementById('context-toggle').checked,
+                prompts_in_session: promptsInSession
+            });
+
+            // Show loader and start cycling messages
+            document.getElementById('loadingIndicator').style.display = 'flex';
+            interval = setInterval(function() {
+                messageIndex = (messageIndex + 1) % messages.length;
+                loaderMessage.textContent = messages[messageIndex];
+            }, 3000);
+
+            // Prepare form data and stream the result back as server-sent events
+            const formData = new FormData(form);
+            let preview = null;
+            fetch(form.action, {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => {
+                if (!response.ok) {
+                    return response.json().then(data => {
+                        throw new Error(data.error || response.statusText);
+                    });
+                }
+                return readEvents(response, function(event, data) {
+                    if (event === 'delta') {
+                        // Swap the loader for the improved prompt as it is written
+                        if (!preview) {
+                            clearInterval(interval);
+                            document.getElementById('loadingIndicator').style.display = 'none';
+                            preview = showPreview();
+                        }
+                        preview.textContent += data.text;
+                    } else if (event === 'error') {
+                        throw new Error(data.error);
+                    } else if (event === 'done') {
+                        // Track successful enhancement
+                        queueEvent('prompt_enhancement_completed', {
+                            target_model: document.getElementById('target_model').value,
+                            has_context: document.getElementById('context-toggle').checked,
+                            prompts_in_session: promptsInSession,
+                            success: true
+                        });
+
+                        // Stop loader and update content
+                        clearInterval(interval);
+                        document.getElementById('loadingIndicator').style.display = 'none';
+                        document.getElementById('pageContainer').innerHTML = data.html;
+                    }
+                });
+            })
+            .catch(err => {
+                // Track error
+                queueEvent('prompt_enhancement_error', {
+                    target_model: document.getElementById('target_model').value,
+                    error_message: err.message,
+                    prompts_in_session: promptsInSession,
+                    success: false
+                });
+
+                clearInterval(interval);
+                document.getElementById('loadingIndicator').style.display = 'none';
+                alert("An error occurred while processing your request.");
+            });
+        });
+    }
+
+    // Track model selection changes
+    const modelSelect = document.getElementById('target_model');
+    if (modelSelect) {
+        modelSelect.addEventListener('change', function() {
+            queueEvent('model_selected', {
+                model: this.value,
+                prompts_in_session: promptsInSession
+            });
+        });
+    }
+
+    // Track context toggle
+    const contextToggle = document.getElementById('context-toggle');
+    if (contextToggle) {
+        contextToggle.addEventListener('change', function() {
+            queueEvent('context_mode_toggled', {
+                enabled: this.checked,
+                prompts_in_session: promptsInSession
+            });
+        });
+    }
+
+    // Enhanced conversation tracking
+    let conversationStartTime = null;
+    let messageCount = 0;
+    if (document.getElementById('send-button')) {
+        function trackMessageSent() {
+            if (!conversationStartTime) {
+                conversationStartTime = Date.now();
+                queueEvent('conversation_started', {
+                    prompts_in_session: promptsInSession
+                });
+            }
+
+            messageCount++;
+
+            // Only answers that were actually sent are reported, so has_input
+            // is always true
+            queueEvent('conversation_message_sent', {
+                has_input: true,
+                message_count: messageCount,
+                prompts_in_session: promptsInSession
+            });
+
+            // Track conversation engagement
+            if (messageCount >= 3) {
+                const conversationDuration = Math.round((Date.now() - conversationStartTime) / 1000);
+                queueEvent('conversation_engaged', {
+                    duration_seconds: conversationDuration,
+                    message_count: messageCount,
+                    prompts_in_session: promptsInSession
+                });
+            }
+        }
+
+        // conversation.js announces each answer it sends, after dropping
+        // empty input, repeated presses and answers sent while a question
+        // is loading
+        document.addEventListener('conversation:answer-sent', trackMessageSent);
+    }
+});
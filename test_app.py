@@ -0,0 +1,55 @@
+import os
+
+os.environ.setdefault("API_KEY", "test")
+
+import app
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_expiring_cache_evicts_when_all_entries_expired():
+    clock = Clock()
+    cache = app.ExpiringLFUCache(maxsize=2, ttl=10, timer=clock)
+    cache["a"] = 1
+    cache["b"] = 2
+    clock.now = 20
+    cache["c"] = 3
+    assert "a" not in cache and "b" not in cache
+    assert cache.get("c") == 3
+
+
+def test_expiring_cache_evicts_expired_victim():
+    clock = Clock()
+    cache = app.ExpiringLFUCache(maxsize=2, ttl=10, timer=clock)
+    cache["a"] = 1
+    clock.now = 5
+    cache["b"] = 2
+    cache.get("b")
+    clock.now = 12
+    cache["c"] = 3
+    assert "a" not in cache
+    assert cache.get("b") == 2 and cache.get("c") == 3
+
+
+def test_expiring_cache_popitem_returns_expired_entry():
+    clock = Clock()
+    cache = app.ExpiringLFUCache(maxsize=2, ttl=10, timer=clock)
+    cache["a"] = 1
+    clock.now = 20
+    assert cache.popitem() == ("a", 1)
+    assert len(cache) == 0
+
+
+def test_expiring_cache_get_drops_expired_entry():
+    clock = Clock()
+    cache = app.ExpiringLFUCache(maxsize=2, ttl=10, timer=clock)
+    cache["a"] = 1
+    clock.now = 20
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0